@@ -30,4 +30,106 @@ options:
       - Whether SSL certificates should be verified.
     type: bool
     default: true
+  task_timeout:
+    description:
+      - Maximum number of seconds to wait for a task on the server to finish.
+      - When it is exceeded, the module fails.
+      - By default, there is no limit.
+    type: float
+  task_cancel_on_timeout:
+    description:
+      - Whether to cancel a task on the server, when it did not finish within I(task_timeout).
+    type: bool
+    default: false
+  metrics:
+    description:
+      - Whether to return metrics of the module run as C(pulp_metrics).
+      - They hold the number of requests, bytes sent and received, and latency percentiles for each endpoint of the api,
+        and the number and durations of calls of helpers, like looking up entities, waiting for tasks, hashing or uploading files.
+    type: bool
+    default: false
+  trace_file:
+    description:
+      - File to write a trace of the module run to, with a span for every request to the server and every call of a helper,
+        like waiting for a task, hashing a file or uploading a chunk.
+      - It is in Chrome trace event format, to be loaded into chrome://tracing or https://ui.perfetto.dev.
+      - C({pid}) in the path is replaced by the process id, to keep the traces of several runs apart.
+      - Can also be set with the environment variable C(PULP_TRACE_FILE).
+    type: path
+  profile_file:
+    description:
+      - File to dump cProfile stats of the module run to. Only the main thread is profiled.
+      - C({pid}) in the path is replaced by the process id.
+      - Can also be set with the environment variable C(PULP_PROFILE_FILE).
+    type: path
+  wait:
+    description:
+      - Whether to wait for tasks on the server to finish.
+      - When false, tasks are left running, and their hrefs are returned as C(task_hrefs), to be waited for later with M(pulp_task).
+      - Entities created or updated by a task are returned as requested then, rather than as stored by the server.
+      - It applies to creating, updating and deleting entities, and to the syncs of M(pulp_file_sync).
+      - Operations whose outcome the module depends on always wait for their tasks, whatever I(wait) says.
+        These are committing chunked artifact uploads, creating file content units from I(units),
+        and changing the content of a repository with M(pulp_file_repository_content) or M(pulp_file_directory_sync).
+    type: bool
+    default: true
+  page_size:
+    description:
+      - Number of entities to retrieve with a single request when listing.
+    type: int
+    default: 200
+  list_workers:
+    description:
+      - Number of pages to retrieve in parallel when listing.
+    type: int
+    default: 4
+  lookup_cache_dir:
+    description:
+      - Directory to cache the hrefs of entities looked up by name in.
+      - When specified, repeated lookups of the same entity are answered without asking the server.
+      - Entities created or deleted by these modules are updated in the cache right away.
+    type: path
+  lookup_cache_ttl:
+    description:
+      - Number of seconds entries in the lookup cache are valid.
+    type: int
+    default: 300
+  connection_pool_maxsize:
+    description:
+      - Maximum number of connections to the server to keep open for reuse.
+      - They are shared by all api clients of a module.
+      - Defaults to the highest number of workers configured for the module, but at least 4.
+    type: int
+  transport:
+    description:
+      - How to talk to the server.
+      - C(openapi) uses the generated pulpcore-client and pulp_file-client packages.
+      - C(rest) uses a thin http client instead, that starts a lot quicker, which pays off for short module runs.
+      - Other than C(openapi), C(rest) opens a new connection for every request, and returns entities just as sent by the server.
+    type: str
+    default: openapi
+    choices:
+      - openapi
+      - rest
+'''
+
+    # Options of modules managing a type of entity
+    ENTITY = r'''
+options:
+  fields:
+    description:
+      - When listing entities, only retrieve and return these fields of each one.
+      - This is a lot cheaper for large numbers of entities.
+    type: list
+  count_only:
+    description:
+      - When listing entities, only return their total number as C(count).
+    type: bool
+    default: false
+  filters:
+    description:
+      - When listing entities, only retrieve the ones matching these filters.
+      - Filters are evaluated by the server. Which ones are supported depends on the type of entity.
+      - Lists are passed as comma separated values, e.g. for C(name__in).
+    type: dict
 '''
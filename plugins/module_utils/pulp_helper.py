@@ -6,63 +6,1106 @@
 from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
+import atexit
+import base64
+import hashlib
+import json
+import mimetypes
 import os
-from shutil import rmtree
+import random
+import re
+import sqlite3
+import ssl
+import threading
+from collections import deque, namedtuple
+from fnmatch import fnmatch
+from itertools import chain, islice
 import traceback
-from tempfile import mkdtemp
-from time import sleep
+import uuid
+from datetime import datetime
+from time import sleep, time
 
 from ansible.module_utils.basic import (
     AnsibleModule,
+    env_fallback,
     missing_required_lib,
 )
+from ansible.module_utils._text import to_bytes
+from ansible.module_utils.six.moves.urllib.parse import urlencode, urlsplit
 
-try:
-    from pulpcore.client import pulpcore
-    HAS_PULPCORE_CLIENT = True
-except ImportError:
-    pulpcore = None
-    HAS_PULPCORE_CLIENT = False
-    PULPCORE_CLIENT_IMPORT_ERROR = traceback.format_exc()
+# The generated api clients take a good share of a short module run to load.
+# So each of them is only imported on first use, and not at all with the rest transport.
+# See import_pulpcore_client and import_pulp_file_client.
+pulpcore = None
+pulp_file = None
+HAS_PULPCORE_CLIENT = None
+HAS_PULP_FILE_CLIENT = None
+PULPCORE_CLIENT_IMPORT_ERROR = None
+PULP_FILE_CLIENT_IMPORT_ERROR = None
+# Classes derived from the generated ones, once they are imported
+PulpcoreApiClient = None
+PulpFileApiClient = None
+NewArtifactsApi = None
+NewFileContentsApi = None
+NewPublicationsFileApi = None
 
 
-try:
-    from pulpcore.client import pulp_file
-    HAS_PULP_FILE_CLIENT = True
-except ImportError:
-    pulp_file = None
-    HAS_PULP_FILE_CLIENT = False
-    PULP_FILE_CLIENT_IMPORT_ERROR = traceback.format_exc()
+PAGE_LIMIT = 200
+# Types of entities, with the plural their api is named by
+ENTITY_TYPES = {
+    'artifact': 'artifacts',
+    'file_content': 'file_contents',
+    'file_distribution': 'file_distributions',
+    'file_publication': 'file_publications',
+    'file_remote': 'file_remotes',
+    'file_repository': 'file_repositories',
+}
+# Options of the modules of single named entities, for the attributes besides the name
+ENTITY_ATTRIBUTES_SPECS = {
+    'file_distribution': dict(
+        base_path=dict(),
+        publication=dict(),
+        content_guard=dict(),
+    ),
+    'file_remote': dict(
+        url=dict(),
+        download_concurrency=dict(type='int'),
+        policy=dict(
+            choices=['immediate', 'on-demand', 'streamed'],
+        ),
+        proxy_url=dict(type='str'),
+        tls_validation=dict(type='bool'),
+    ),
+    'file_repository': dict(
+        description=dict(),
+    ),
+}
+# Requirements of the modules of single named entities, depending on the state
+ENTITY_REQUIRED_IF = {
+    'file_distribution': [
+        ('state', 'present', ['name', 'base_path']),
+        ('state', 'absent', ['name']),
+    ],
+    'file_remote': [
+        ('state', 'present', ['name']),
+        ('state', 'absent', ['name']),
+    ],
+    'file_repository': [
+        ('state', 'present', ['name']),
+        ('state', 'absent', ['name']),
+    ],
+}
+CONTENT_CHUNK_SIZE = 512 * 1024  # 1/2 MB
+TASK_FINAL_STATES = ['completed', 'failed', 'canceled']
+MANIFEST_TIMEOUT = 30  # seconds
 
+# A page of list results with plain dicts in place of model objects
+ListPage = namedtuple('ListPage', ['results', 'count', 'next'])
+TASK_POLL_INITIAL = 0.2  # seconds
+TASK_POLL_MAX = 10  # seconds
+TASK_POLL_FACTOR = 1.5
 
-PAGE_LIMIT = 20
-CONTENT_CHUNK_SIZE = 512 * 1024  # 1/2 MB
+
+class WorkerFailure(SystemExit):
+    """A fail_json in a worker thread of threaded_imap, to be reported by the calling thread."""
+
+    def __init__(self, module, kwargs):
+        super(WorkerFailure, self).__init__(1)
+        self.module = module
+        self.kwargs = kwargs
+
+
+def report_failures(failures):
+    """Call fail_json once for a number of WorkerFailures, with all of their messages."""
+    kwargs = dict(failures[0].kwargs)
+    messages = []
+    for failure in failures:
+        if failure.kwargs.get('msg') not in messages:
+            messages.append(failure.kwargs.get('msg'))
+    kwargs['msg'] = ' '.join(str(message) for message in messages)
+    failures[0].module.fail_json(**kwargs)
+
+
+def threaded_imap(func, iterable, workers=1):
+    """Apply func to every item of iterable using a pool of worker threads.
+
+    Results are yielded in the order of iterable. Only a bounded number of items is pulled from
+    iterable ahead of the results consumed, so it may be a lazy generator over large data.
+    The first exception raised by func is propagated, and all outstanding work is abandoned.
+    A fail_json in func is different: the items already running are waited for, and the calling
+    thread reports the failures of all of them at once.
+    With a single worker, everything runs sequentially in the calling thread.
+    """
+    if workers <= 1:
+        for item in iterable:
+            yield func(item)
+        return
+
+    failures = []
+
+    def call(item):
+        # The pool would not pass on a SystemExit, and leave the caller waiting forever.
+        try:
+            return func(item), None
+        except WorkerFailure as e:
+            failures.append(e)
+            return None, e
+
+    def result(async_result):
+        value, failure = async_result.get()
+        if failure is not None:
+            raise failure
+        return value
+
+    # Loading the pool takes a while, and is only needed with several workers.
+    from multiprocessing.pool import ThreadPool
+
+    pool = ThreadPool(workers)
+    try:
+        pending = deque()
+        for item in iterable:
+            pending.append(pool.apply_async(call, (item, )))
+            if len(pending) >= 2 * workers:
+                yield result(pending.popleft())
+        while pending:
+            yield result(pending.popleft())
+    except WorkerFailure:
+        # Reported below, once the items still running are done.
+        pass
+    finally:
+        # Queued items are dropped, but the ones running are finished first.
+        pool.terminate()
+        pool.join()
+    if failures:
+        report_failures(failures)
+
+
+def task_poll_intervals():
+    """Generate the delays between polls of a running task.
+
+    Polls are quick at first to not delay short tasks, then back off exponentially up to a cap.
+    Some jitter keeps concurrent waiters from polling in lockstep.
+    """
+    delay = TASK_POLL_INITIAL
+    while True:
+        yield delay * random.uniform(0.8, 1.2)
+        delay = min(delay * TASK_POLL_FACTOR, TASK_POLL_MAX)
+
+
+def parse_timestamp(value):
+    """Return a timestamp of the server as datetime.
+
+    The generated clients parse timestamps already, the rest transport leaves them as sent.
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+    value = value.rstrip('Z').split('+')[0]
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f' if '.' in value else '%Y-%m-%dT%H:%M:%S')
+
+
+def task_duration(task):
+    """Return the number of seconds a finished task ran on the server, or None if it never started."""
+    started_at = parse_timestamp(task.started_at)
+    finished_at = parse_timestamp(task.finished_at)
+    if started_at is None or finished_at is None:
+        return None
+    return round((finished_at - started_at).total_seconds(), 3)
+
+
+def find_files(src_dir, pattern):
+    """Return the paths of all files below src_dir, whose path relative to src_dir matches pattern."""
+    paths = []
+    for root, dirs, files in os.walk(src_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            if fnmatch(os.path.relpath(path, src_dir), pattern):
+                paths.append(path)
+    return sorted(paths)
+
+
+def file_identity(path):
+    """Describe a local file well enough to tell whether it was changed since."""
+    stat = os.stat(path)
+    return {
+        'path': os.path.realpath(path),
+        'device': stat.st_dev,
+        'inode': stat.st_ino,
+        'size': stat.st_size,
+        'mtime_ns': getattr(stat, 'st_mtime_ns', int(stat.st_mtime * 1000000000)),
+    }
+
+
+class UploadState(object):
+    """Persistent record of a chunked upload, so that it can be resumed by a later run.
+
+    The state file holds the upload href and the identity of the uploaded file. It is written
+    once, when the upload is started; which chunks arrived is asked of the server on resume.
+    """
+
+    def __init__(self, state_dir, pulp_url, path):
+        self.identity = file_identity(path)
+        key = hashlib.sha1('{0}|{1}'.format(pulp_url, self.identity['path']).encode('utf-8')).hexdigest()
+        self.state_file = os.path.join(state_dir, key + '.json')
+        self.upload_href = None
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+        except (IOError, ValueError):
+            state = None
+        if state:
+            self.stale_upload_href = state['upload_href'] if state['identity'] != self.identity else None
+            if not self.stale_upload_href:
+                self.upload_href = state['upload_href']
+        else:
+            self.stale_upload_href = None
+
+    def start(self, upload_href):
+        self.upload_href = upload_href
+        self._save()
+
+    def remove(self):
+        if os.path.exists(self.state_file):
+            os.remove(self.state_file)
+
+    def _save(self):
+        state_dir = os.path.dirname(self.state_file)
+        if not os.path.isdir(state_dir):
+            os.makedirs(state_dir)
+        temp_file = self.state_file + '.{0}.tmp'.format(os.getpid())
+        with open(temp_file, 'w') as f:
+            json.dump({'upload_href': self.upload_href, 'identity': self.identity}, f)
+        os.rename(temp_file, self.state_file)
+
+
+class SqliteCache(object):
+    """Base of on-disk caches kept in a sqlite database.
+
+    sqlite does the locking, which makes the caches safe to be used by several processes at once.
+    Within a process, the connection may be shared by threads.
+    """
+
+    SCHEMA = None
+
+    def __init__(self, cache_file):
+        cache_dir = os.path.dirname(cache_file)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(cache_file, timeout=60, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(self.SCHEMA)
+
+
+class DigestCache(SqliteCache):
+    """On-disk cache of sha256 digests of local files.
+
+    Entries are keyed by (device, inode, size, mtime_ns) of the file, so any modification of it
+    invalidates its entry. Beyond max_entries, the least recently used entries are evicted.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS digests ('
+        'device INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER, sha256 TEXT, last_used REAL, '
+        'PRIMARY KEY (device, inode, size, mtime_ns))'
+    )
+    # Files modified this recently may still be written to within the same mtime tick.
+    MIN_AGE = 2
+
+    def __init__(self, cache_dir, max_entries):
+        super(DigestCache, self).__init__(os.path.join(cache_dir, 'digests.sqlite'))
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(identity):
+        return (identity['device'], identity['inode'], identity['size'], identity['mtime_ns'])
+
+    def get(self, identity):
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                'SELECT sha256 FROM digests WHERE device=? AND inode=? AND size=? AND mtime_ns=?',
+                self._key(identity),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._connection.execute(
+                'UPDATE digests SET last_used=? WHERE device=? AND inode=? AND size=? AND mtime_ns=?',
+                (time(), ) + self._key(identity),
+            )
+        return row[0]
+
+    def set(self, identity, sha256):
+        if identity['mtime_ns'] > (time() - self.MIN_AGE) * 1000000000:
+            return
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO digests (device, inode, size, mtime_ns, sha256, last_used) VALUES (?, ?, ?, ?, ?, ?)',
+                self._key(identity) + (sha256, time()),
+            )
+            self._connection.execute(
+                'DELETE FROM digests WHERE rowid IN (SELECT rowid FROM digests ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries, ),
+            )
+
+
+class LookupCache(SqliteCache):
+    """On-disk cache of the hrefs of entities, keyed by server, entity type and natural key.
+
+    Entries expire after ttl seconds. Entities created, changed or deleted through this
+    collection update or drop their entries right away.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS lookups ('
+        'server TEXT, entity_type TEXT, natural_key TEXT, pulp_href TEXT, expires REAL, '
+        'PRIMARY KEY (server, entity_type, natural_key))'
+    )
+
+    def __init__(self, cache_dir, server, ttl):
+        super(LookupCache, self).__init__(os.path.join(cache_dir, 'lookups.sqlite'))
+        self.server = server
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, entity_type, natural_key):
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                'SELECT pulp_href FROM lookups WHERE server=? AND entity_type=? AND natural_key=? AND expires>?',
+                (self.server, entity_type, json.dumps(natural_key, sort_keys=True), time()),
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def set(self, entity_type, natural_key, pulp_href):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM lookups WHERE expires<=?', (time(), ))
+            self._connection.execute(
+                'INSERT OR REPLACE INTO lookups (server, entity_type, natural_key, pulp_href, expires) VALUES (?, ?, ?, ?, ?)',
+                (self.server, entity_type, json.dumps(natural_key, sort_keys=True), pulp_href, time() + self.ttl),
+            )
+
+    def invalidate(self, entity_type, natural_key=None, pulp_href=None):
+        with self._lock, self._connection:
+            if natural_key is not None:
+                self._connection.execute(
+                    'DELETE FROM lookups WHERE server=? AND entity_type=? AND natural_key=?',
+                    (self.server, entity_type, json.dumps(natural_key, sort_keys=True)),
+                )
+            if pulp_href is not None:
+                self._connection.execute(
+                    'DELETE FROM lookups WHERE server=? AND entity_type=? AND pulp_href=?',
+                    (self.server, entity_type, pulp_href),
+                )
+
+
+class SyncCache(SqliteCache):
+    """On-disk record of the last successful sync of each repository from a remote.
+
+    It keeps the ETag and the sha256 digest of the manifest that was synced, and when the remote was last updated,
+    so a sync from an unchanged manifest with unchanged settings can be skipped.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS syncs ('
+        'server TEXT, repository TEXT, remote TEXT, url TEXT, remote_updated TEXT, etag TEXT, sha256 TEXT, '
+        'repository_version TEXT, synced_at REAL, '
+        'PRIMARY KEY (server, repository, remote))'
+    )
+    FIELDS = ('url', 'remote_updated', 'etag', 'sha256', 'repository_version', 'synced_at')
+
+    def __init__(self, cache_dir, server):
+        super(SyncCache, self).__init__(os.path.join(cache_dir, 'syncs.sqlite'))
+        self.server = server
+
+    def get(self, repository_href, remote_href):
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                'SELECT {0} FROM syncs WHERE server=? AND repository=? AND remote=?'.format(', '.join(self.FIELDS)),
+                (self.server, repository_href, remote_href),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(self.FIELDS, row))
+
+    def set(self, repository_href, remote_href, url, remote_updated, etag, sha256, repository_version, synced_at=None):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO syncs (server, repository, remote, {0}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'.format(', '.join(self.FIELDS)),
+                (self.server, repository_href, remote_href, url, remote_updated, etag, sha256, repository_version, synced_at or time()),
+            )
+
+
+def fetch_manifest_fingerprint(url, etag=None, validate_certs=True, timeout=MANIFEST_TIMEOUT):
+    """Return the ETag and the sha256 digest of the manifest at url.
+
+    Given the ETag of an earlier fetch, the server may answer that the manifest did not change.
+    The digest is None then.
+    """
+    from ansible.module_utils.six.moves.urllib.error import HTTPError
+    from ansible.module_utils.six.moves.urllib.request import Request, urlopen
+
+    ssl_context = ssl.create_default_context()
+    if not validate_certs:
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+    request = Request(url, headers={'If-None-Match': etag} if etag else {})
+    try:
+        response = urlopen(request, context=ssl_context, timeout=timeout)
+    except HTTPError as e:
+        if e.code == 304:
+            return etag, None
+        raise
+    sha256 = hashlib.sha256()
+    for chunk in iter(lambda: response.read(CONTENT_CHUNK_SIZE), b''):
+        sha256.update(chunk)
+    return response.headers.get('ETag'), sha256.hexdigest()
+
+
+# Ids in hrefs, to be left out of the names of endpoints
+HREF_ID = re.compile(r'/(?:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9]+)(?=/)')
+# Helpers of PulpAnsibleModule, whose calls are reported to instruments
+INSTRUMENTED_HELPERS = [
+    '_upload_chunk',
+    '_wait_before_next_poll',
+    'chunked_upload',
+    'find_entities_by_name',
+    'find_entity',
+    'find_entity_href',
+    'list_entities',
+    'sha256',
+    'wait_for_task',
+]
+
+
+def endpoint_name(method, url):
+    """Name the endpoint of a request by its method and path, with ids replaced by a placeholder."""
+    return '{0} {1}'.format(method, HREF_ID.sub('/{id}', urlsplit(url).path))
+
+
+def request_size(body=None, post_params=None):
+    """Estimate the number of bytes sent with a request of a generated api client."""
+    size = 0
+    if body is not None:
+        size += len(json.dumps(body))
+    for key, value in post_params or []:
+        # Files are passed as (filename, data, mimetype).
+        size += len(value[1]) if isinstance(value, tuple) else len(str(value))
+    return size
+
+
+def instrument_api_client(api_client, instruments):
+    """Report every request of a generated api client to instruments."""
+    request = api_client.request
+
+    def instrumented_request(method, url, query_params=None, headers=None, post_params=None, body=None, **kwargs):
+        start = time()
+        try:
+            response = request(method, url, query_params=query_params, headers=headers, post_params=post_params, body=body, **kwargs)
+        except Exception as e:
+            received = len(getattr(e, 'body', None) or '')
+            for instrument in instruments:
+                instrument.on_request(method, url, start, time(), request_size(body, post_params), received, error=True)
+            raise
+        # A response that is not preloaded is read here, and keeps its content for the caller.
+        received = len(response.data or '')
+        for instrument in instruments:
+            instrument.on_request(method, url, start, time(), request_size(body, post_params), received)
+        return response
+
+    api_client.request = instrumented_request
+
+
+def instrument_rest_client(rest_client, instruments):
+    """Report every request of a PulpRestClient to instruments."""
+    send = rest_client.send
+
+    def instrumented_send(method, url, body, headers):
+        start = time()
+        try:
+            content = send(method, url, body, headers)
+        except Exception as e:
+            received = len(getattr(e, 'body', None) or '')
+            for instrument in instruments:
+                instrument.on_request(method, url, start, time(), len(body or ''), received, error=True)
+            raise
+        for instrument in instruments:
+            instrument.on_request(method, url, start, time(), len(body or ''), len(content or ''))
+        return content
+
+    rest_client.send = instrumented_send
+
+
+def instrument_call(name, func, instruments):
+    """Wrap func to report each of its calls to instruments."""
+    def instrumented_call(*args, **kwargs):
+        start = time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            end = time()
+            for instrument in instruments:
+                instrument.on_call(name, start, end, args)
+    return instrumented_call
+
+
+def percentiles(values):
+    """Return the median, 90th and 99th percentile, and the maximum of values, in milliseconds."""
+    values = sorted(values)
+
+    def percentile(fraction):
+        return round(values[max(int(round(fraction * len(values))) - 1, 0)] * 1000, 1)
+
+    return {'p50': percentile(0.5), 'p90': percentile(0.9), 'p99': percentile(0.99), 'max': percentile(1)}
+
+
+class Metrics(object):
+    """Instrument collecting request counts, bytes transferred and latencies by endpoint, and durations of helper calls.
+
+    Like any instrument, it gets to know of every request by on_request, and of every call of a helper by on_call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start = time()
+        self._requests = {}
+        self._calls = {}
+
+    def on_request(self, method, url, start, end, sent, received, error=False):
+        with self._lock:
+            endpoint = self._requests.setdefault(endpoint_name(method, url), {
+                'count': 0,
+                'errors': 0,
+                'bytes_sent': 0,
+                'bytes_received': 0,
+                'latencies': [],
+            })
+            endpoint['count'] += 1
+            endpoint['errors'] += int(error)
+            endpoint['bytes_sent'] += sent
+            endpoint['bytes_received'] += received
+            endpoint['latencies'].append(end - start)
+
+    def on_call(self, name, start, end, args=()):
+        with self._lock:
+            self._calls.setdefault(name, []).append(end - start)
+
+    def report(self):
+        with self._lock:
+            requests = {}
+            for name, endpoint in self._requests.items():
+                requests[name] = dict((key, value) for key, value in endpoint.items() if key != 'latencies')
+                requests[name]['latency_ms'] = percentiles(endpoint['latencies'])
+            calls = dict(
+                (name, {'count': len(durations), 'total_ms': round(sum(durations) * 1000, 1), 'latency_ms': percentiles(durations)})
+                for name, durations in self._calls.items()
+            )
+        return {
+            'elapsed_ms': round((time() - self._start) * 1000, 1),
+            'request_count': sum(endpoint['count'] for endpoint in requests.values()),
+            'requests': requests,
+            'calls': calls,
+        }
+
+
+def describe_argument(value):
+    """Shorten an argument of a helper call for a trace."""
+    if isinstance(value, bytes):
+        return '<{0} bytes>'.format(len(value))
+    value = str(value)
+    return value if len(value) <= 200 else value[:200] + '...'
+
+
+class Tracer(object):
+    """Instrument writing a span of every request and helper call to trace_file.
+
+    The file is in Chrome trace event format, so the timeline of the module run can be loaded
+    into chrome://tracing or https://ui.perfetto.dev. It is written when the process exits.
+    """
+
+    def __init__(self, trace_file):
+        self.trace_file = trace_file
+        self._lock = threading.Lock()
+        self._start = time()
+        self._pid = os.getpid()
+        self._threads = {}
+        self._events = []
+
+    def _span(self, name, category, start, end, args):
+        thread = threading.current_thread()
+        with self._lock:
+            if thread.ident not in self._threads:
+                self._threads[thread.ident] = len(self._threads) + 1
+                self._events.append({
+                    'name': 'thread_name',
+                    'ph': 'M',
+                    'pid': self._pid,
+                    'tid': self._threads[thread.ident],
+                    'args': {'name': thread.name},
+                })
+            self._events.append({
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': int(start * 1000000),
+                'dur': int((end - start) * 1000000),
+                'pid': self._pid,
+                'tid': self._threads[thread.ident],
+                'args': args,
+            })
+
+    def on_request(self, method, url, start, end, sent, received, error=False):
+        self._span(endpoint_name(method, url), 'http', start, end, {
+            'url': url,
+            'bytes_sent': sent,
+            'bytes_received': received,
+            'error': error,
+        })
+
+    def on_call(self, name, start, end, args=()):
+        self._span(name, 'helper', start, end, {'args': [describe_argument(arg) for arg in args]})
+
+    def write(self):
+        self._span('module run', 'module', self._start, time(), {})
+        with self._lock:
+            events = list(self._events)
+        trace_dir = os.path.dirname(self.trace_file)
+        if trace_dir and not os.path.isdir(trace_dir):
+            os.makedirs(trace_dir)
+        temp_file = self.trace_file + '.{0}.tmp'.format(self._pid)
+        with open(temp_file, 'w') as f:
+            f.write('[\n' + ',\n'.join(json.dumps(event, sort_keys=True) for event in events) + '\n]\n')
+        os.rename(temp_file, self.trace_file)
+
+
+def start_profile(profile_file):
+    """Profile the rest of the run of the main thread with cProfile, and dump the stats to profile_file when the process exits."""
+    import cProfile
+
+    profile = cProfile.Profile()
+
+    def dump():
+        profile.disable()
+        profile_dir = os.path.dirname(profile_file)
+        if profile_dir and not os.path.isdir(profile_dir):
+            os.makedirs(profile_dir)
+        profile.dump_stats(profile_file)
+
+    atexit.register(dump)
+    profile.enable()
+
+
+class ApiClientMixin(object):
+    def files_parameters(self, files=None):
+        # Besides file paths, accept (filename, data) tuples to upload data straight from memory.
+        params = []
+        file_paths = {}
+        for key, value in (files or {}).items():
+            if isinstance(value, tuple):
+                filename, filedata = value
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                params.append((key, (filename, filedata, mimetype)))
+            else:
+                file_paths[key] = value
+        params.extend(super(ApiClientMixin, self).files_parameters(file_paths))
+        return params
+
+
+class ArtifactsApiMixin(object):
+    # Instances need the module set, to upload large files in chunks.
+    module = None
+
+    def create(self, entity, **kwargs):
+        workers = kwargs.pop('upload_workers', self.module.params.get('upload_workers') or 1)
+        size = os.stat(entity.file).st_size
+        if size > CONTENT_CHUNK_SIZE:
+            return self.module.chunked_upload(
+                entity.file,
+                entity.sha256,
+                size,
+                workers=workers,
+                state_dir=self.module.params.get('upload_state_dir'),
+            )
+        # TODO Why is the ArtifactsApi strange with create?
+        payload = {
+            'file': entity.file,
+            'sha256': entity.sha256,
+        }
+        payload.update(kwargs)
+        try:
+            return super(ArtifactsApiMixin, self).create(**payload)
+        except Exception as e:
+            # Either transport tells the http status and the body of an error response.
+            if entity.sha256 and getattr(e, 'status', None) == 400 and b'checksum' in to_bytes(getattr(e, 'body', None) or ''):
+                self.module.fail_json(msg="File checksum mismatch.")
+            raise
+
+
+class FileContentsApiMixin(object):
+    def create(self, entity, **kwargs):
+        # TODO Why is the FileContentsApi strange with create?
+        payload = {
+            'artifact': entity.artifact,
+            'relative_path': entity.relative_path,
+        }
+        payload.update(kwargs)
+        return super(FileContentsApiMixin, self).create(**payload)
+
+
+class PublicationsFileApiMixin(object):
+    def list(self, repository_version=None, **kwargs):
+        # The generated client does not know the repository_version filter.
+        if repository_version is None:
+            return super(PublicationsFileApiMixin, self).list(**kwargs)
+        query_params = [('repository_version', repository_version)]
+        # Other filters are passed on as they are; the server ignores those it does not know.
+        query_params.extend(
+            (key, value) for key, value in sorted(kwargs.items()) if not key.startswith('_') and value is not None
+        )
+        return self.api_client.call_api(
+            '/pulp/api/v3/publications/file/file/', 'GET',
+            query_params=query_params,
+            header_params={'Accept': 'application/json'},
+            response_type='InlineResponse2003',
+            auth_settings=['Basic'],
+            _return_http_data_only=True,
+            _preload_content=kwargs.get('_preload_content', True),
+        )
+
+
+class FileContentMixin(object):
+    # Subclasses need the module set, to look up artifacts.
+    module = None
+
+    def __init__(self, **kwargs):
+        # FileContent can only be searched by digest, while it wants srtifact to create.
+        if 'digest' in kwargs:
+            artifact = self.module.find_entity(self.module.artifacts_api, {'sha256': kwargs.pop('digest')})
+            kwargs['artifact'] = artifact.pulp_href
+        super(FileContentMixin, self).__init__(**kwargs)
+
+
+def import_pulpcore_client():
+    """Import pulpcore-client, and derive the extended api classes from it, unless that was done already.
+
+    Returns whether it is installed.
+    """
+    global pulpcore, HAS_PULPCORE_CLIENT, PULPCORE_CLIENT_IMPORT_ERROR, PulpcoreApiClient, NewArtifactsApi
+    if HAS_PULPCORE_CLIENT is None:
+        try:
+            from pulpcore.client import pulpcore
+        except ImportError:
+            HAS_PULPCORE_CLIENT = False
+            PULPCORE_CLIENT_IMPORT_ERROR = traceback.format_exc()
+        else:
+            HAS_PULPCORE_CLIENT = True
+            PulpcoreApiClient = type('NewApiClient', (ApiClientMixin, pulpcore.ApiClient), {})
+            NewArtifactsApi = type('NewArtifactsApi', (ArtifactsApiMixin, pulpcore.ArtifactsApi), {})
+    return HAS_PULPCORE_CLIENT
+
+
+def import_pulp_file_client():
+    """Import pulp_file-client, and derive the extended api classes from it, unless that was done already.
+
+    Returns whether it is installed.
+    """
+    global pulp_file, HAS_PULP_FILE_CLIENT, PULP_FILE_CLIENT_IMPORT_ERROR, PulpFileApiClient, NewFileContentsApi, NewPublicationsFileApi
+    if HAS_PULP_FILE_CLIENT is None:
+        try:
+            from pulpcore.client import pulp_file
+        except ImportError:
+            HAS_PULP_FILE_CLIENT = False
+            PULP_FILE_CLIENT_IMPORT_ERROR = traceback.format_exc()
+        else:
+            HAS_PULP_FILE_CLIENT = True
+            PulpFileApiClient = type('NewApiClient', (ApiClientMixin, pulp_file.ApiClient), {})
+            NewFileContentsApi = type('NewFileContentsApi', (FileContentsApiMixin, pulp_file.ContentFilesApi), {})
+            NewPublicationsFileApi = type('NewPublicationsFileApi', (PublicationsFileApiMixin, pulp_file.PublicationsFileApi), {})
+    return HAS_PULP_FILE_CLIENT
+
+
+def encode_multipart(fields, files):
+    """Encode form fields and (filename, data) tuples of files as multipart/form-data.
+
+    Returns the content type, including the boundary, and the body.
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in sorted(fields.items()):
+        parts.append('--{0}\r\nContent-Disposition: form-data; name="{1}"\r\n\r\n{2}\r\n'.format(boundary, name, value).encode('utf-8'))
+    for name, (filename, data) in sorted(files.items()):
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        parts.append(
+            '--{0}\r\nContent-Disposition: form-data; name="{1}"; filename="{2}"\r\nContent-Type: {3}\r\n\r\n'.format(
+                boundary, name, filename, mimetype,
+            ).encode('utf-8')
+        )
+        parts.append(data)
+        parts.append(b'\r\n')
+    parts.append('--{0}--\r\n'.format(boundary).encode('utf-8'))
+    return 'multipart/form-data; boundary=' + boundary, b''.join(parts)
+
+
+class PulpRestError(Exception):
+    """An error response of the server to a request of PulpRestClient."""
+
+    def __init__(self, status, reason, body=None):
+        self.status = status
+        self.reason = reason
+        self.body = body
+        super(PulpRestError, self).__init__('({0}) {1}: {2}'.format(status, reason, body))
+
+
+class PulpRestClient(object):
+    """Thin client for the parts of the Pulp api these modules use.
+
+    Requests are made with plain urllib, and answered with plain dicts decoded from json.
+    Other than the generated clients, or even ansible's open_url, it loads in no time.
+    But it opens a new connection for every request.
+    """
+
+    API_PATH = '/pulp/api/v3/'
+
+    def __init__(self, pulp_url, username, password, validate_certs=True):
+        self.pulp_url = pulp_url.rstrip('/')
+        self.authorization = 'Basic ' + base64.b64encode('{0}:{1}'.format(username, password).encode('utf-8')).decode('ascii')
+        self.ssl_context = ssl.create_default_context()
+        if not validate_certs:
+            self.ssl_context.check_hostname = False
+            self.ssl_context.verify_mode = ssl.CERT_NONE
+
+    def url(self, path, query=None):
+        # Paths are either relative to the api root, or hrefs as returned by the server.
+        if not path.startswith('/'):
+            path = self.API_PATH + path
+        url = self.pulp_url + path
+        query = sorted((key, value) for key, value in (query or {}).items() if value is not None)
+        if query:
+            url += '?' + urlencode(query)
+        return url
+
+    def send(self, method, url, body, headers):
+        """Send a request, and return the content of the response."""
+        from ansible.module_utils.six.moves.urllib.error import HTTPError
+        from ansible.module_utils.six.moves.urllib.request import Request, urlopen
+
+        request = Request(url, data=body, headers=headers)
+        request.get_method = lambda: method
+        try:
+            response = urlopen(request, context=self.ssl_context)
+        except HTTPError as e:
+            raise PulpRestError(e.code, e.reason, e.read())
+        return response.read()
+
+    def request(self, method, path, query=None, data=None, files=None, headers=None):
+        headers = dict(headers or {}, Accept='application/json')
+        headers['Authorization'] = self.authorization
+        headers['Content-Type'] = 'application/json'
+        body = None
+        if files:
+            headers['Content-Type'], body = encode_multipart(data or {}, files)
+        elif data is not None:
+            body = json.dumps(data).encode('utf-8')
+        content = self.send(method, self.url(path, query), body, headers)
+        return json.loads(content.decode('utf-8')) if content else None
+
+    def list(self, path, **query):
+        return self.request('GET', path, query=query)
+
+    def read(self, pulp_href, **query):
+        return self.request('GET', pulp_href, query=query)
+
+    def create(self, path, data, files=None):
+        return self.request('POST', path, data=data, files=files)
+
+    def partial_update(self, pulp_href, data):
+        return self.request('PATCH', pulp_href, data=data)
+
+    def delete(self, pulp_href):
+        return self.request('DELETE', pulp_href)
+
+
+class RestEntity(dict):
+    """A plain dict of an entity, whose keys can also be used like the attributes of a generated model."""
+
+    # Fields of the type of entity, see the subclasses below
+    fields = ()
+
+    def __init__(self, *args, **kwargs):
+        # An entity made up here, like one to be created in check mode, has every field of the type,
+        # just like a generated model, or an entity sent by the server.
+        super(RestEntity, self).__init__(dict.fromkeys(self.fields))
+        self.update(*args, **kwargs)
+
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+    def to_dict(self):
+        return dict(self)
+
+
+def rest_entity(data):
+    return RestEntity(data) if data is not None else None
+
+
+class RestArtifact(RestEntity):
+    fields = ('pulp_href', 'pulp_created', 'file', 'size', 'md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512')
+
+
+class RestFileContent(RestEntity):
+    fields = ('pulp_href', 'pulp_created', 'artifact', 'relative_path', 'md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512')
+
+
+class RestFileDistribution(RestEntity):
+    fields = ('pulp_href', 'pulp_created', 'base_path', 'base_url', 'content_guard', 'name', 'publication')
+
+
+class RestFilePublication(RestEntity):
+    fields = ('pulp_href', 'pulp_created', 'repository_version', 'repository', 'distributions', 'manifest')
+
+
+class RestFileRemote(RestEntity):
+    fields = (
+        'pulp_href', 'pulp_created', 'name', 'url', 'ca_cert', 'client_cert', 'client_key', 'tls_validation', 'proxy_url',
+        'pulp_last_updated', 'download_concurrency', 'policy',
+    )
+
+
+class RestFileRepository(RestEntity):
+    fields = ('pulp_href', 'pulp_created', 'versions_href', 'latest_version_href', 'name', 'description')
+
+
+class RestEntityApi(object):
+    """Stand-in for a generated api class of one type of entity, backed by a PulpRestClient.
+
+    Like with the generated classes, what can be done to an entity is told by the methods present.
+    """
+
+    def __init__(self, module, client, path):
+        self.module = module
+        self.client = client
+        self.path = path
+
+    def list(self, **query):
+        page = self.client.list(self.path, **query)
+        return ListPage(results=[RestEntity(item) for item in page['results']], count=page['count'], next=page['next'])
+
+    def read(self, pulp_href):
+        return rest_entity(self.client.read(pulp_href))
+
+
+class RestCreateMixin(object):
+    def create(self, entity):
+        return rest_entity(self.client.create(self.path, dict((key, value) for key, value in entity.items() if value is not None)))
+
+
+class RestUpdateMixin(object):
+    def update(self, pulp_href, attributes):
+        # Only the changed attributes are sent, see update_entity.
+        return rest_entity(self.client.partial_update(pulp_href, attributes))
+
+
+class RestDeleteMixin(object):
+    def delete(self, pulp_href):
+        return rest_entity(self.client.delete(pulp_href))
+
+
+class RestArtifactUploadMixin(object):
+    def create(self, file, sha256):
+        with open(file, 'rb') as f:
+            files = {'file': (os.path.basename(file), f.read())}
+        return rest_entity(self.client.create(self.path, {'sha256': sha256}, files=files))
+
+
+class RestArtifactsApi(ArtifactsApiMixin, RestEntityApi, RestArtifactUploadMixin, RestDeleteMixin):
+    pass
+
+
+class RestFileContentsApi(RestEntityApi, RestCreateMixin):
+    pass
+
+
+class RestFileDistributionsApi(RestEntityApi, RestCreateMixin, RestUpdateMixin, RestDeleteMixin):
+    pass
+
+
+class RestFilePublicationsApi(RestEntityApi, RestCreateMixin, RestDeleteMixin):
+    pass
+
+
+class RestFileRemotesApi(RestEntityApi, RestCreateMixin, RestUpdateMixin, RestDeleteMixin):
+    pass
+
+
+class RestFileRepositoriesApi(RestEntityApi, RestCreateMixin, RestUpdateMixin, RestDeleteMixin):
+    def sync(self, pulp_href, data):
+        return rest_entity(self.client.create(pulp_href + 'sync/', data))
+
+    def modify(self, pulp_href, data):
+        return rest_entity(self.client.create(pulp_href + 'modify/', data))
+
+
+class RestStatusApi(RestEntityApi):
+    def status_read(self):
+        return rest_entity(self.client.read(self.path))
+
+
+class RestTasksApi(RestEntityApi):
+    def tasks_cancel(self, pulp_href, data):
+        return rest_entity(self.client.partial_update(pulp_href, data))
+
+
+class RestUploadsApi(RestEntityApi, RestCreateMixin, RestDeleteMixin):
+    def read(self, pulp_href):
+        upload = rest_entity(self.client.read(pulp_href))
+        upload.chunks = [RestEntity(chunk) for chunk in upload.get('chunks') or []]
+        return upload
+
+    def update(self, upload_href, content_range, file):
+        return rest_entity(self.client.request('PUT', upload_href, files={'file': file}, headers={'Content-Range': content_range}))
+
+    def commit(self, pulp_href, data):
+        return rest_entity(self.client.create(pulp_href + 'commit/', data))
 
 
 class PulpAnsibleModule(AnsibleModule):
 
     def __init__(self, argument_spec={}, **kwargs):
+        # Worker threads do not report a fail_json themselves, see threaded_imap.
+        self._thread = threading.current_thread()
         spec = dict(
             pulp_url=dict(required=True),
             username=dict(required=True),
             password=dict(required=True, no_log=True),
             validate_certs=dict(type='bool', default=True),
+            task_timeout=dict(type='float'),
+            task_cancel_on_timeout=dict(type='bool', default=False),
+            wait=dict(type='bool', default=True),
+            page_size=dict(type='int', default=PAGE_LIMIT),
+            list_workers=dict(type='int', default=4),
+            lookup_cache_dir=dict(type='path'),
+            lookup_cache_ttl=dict(type='int', default=300),
+            connection_pool_maxsize=dict(type='int'),
+            transport=dict(default='openapi', choices=['openapi', 'rest']),
+            metrics=dict(type='bool', default=False),
+            trace_file=dict(type='path', fallback=(env_fallback, ['PULP_TRACE_FILE'])),
+            profile_file=dict(type='path', fallback=(env_fallback, ['PULP_PROFILE_FILE'])),
         )
         spec.update(argument_spec)
         kwargs['supports_check_mode'] = kwargs.get('supports_check_mode', True)
         super(PulpAnsibleModule, self).__init__(argument_spec=spec, **kwargs)
-        if not HAS_PULPCORE_CLIENT:
-            self.fail_json(
-                msg=missing_required_lib("pulpcore-client"),
-                exception=PULPCORE_CLIENT_IMPORT_ERROR,
-            )
-        self._api_config = pulpcore.Configuration()
-        self._api_config.host = self.params['pulp_url']
-        self._api_config.username = self.params['username']
-        self._api_config.password = self.params['password']
-        self._api_config.verify_ssl = self.params['validate_certs']
-        self._api_config.safe_chars_for_path_param = '/'
-        self._client = pulpcore.ApiClient(self._api_config)
         self._file_client = None
         self._artifacts_api = None
         self._file_contents_api = None
@@ -73,75 +1116,129 @@ class PulpAnsibleModule(AnsibleModule):
         self._status_api = None
         self._tasks_api = None
         self._uploads_api = None
+        self._rest = self.params['transport'] == 'rest'
+        if self._rest:
+            self._client = PulpRestClient(
+                self.params['pulp_url'],
+                self.params['username'],
+                self.params['password'],
+                validate_certs=self.params['validate_certs'],
+            )
+            self._file_client = self._client
+            self._artifacts_api = RestArtifactsApi(self, self._client, 'artifacts/')
+            self._file_contents_api = RestFileContentsApi(self, self._client, 'content/file/files/')
+            self._file_distributions_api = RestFileDistributionsApi(self, self._client, 'distributions/file/file/')
+            self._file_publications_api = RestFilePublicationsApi(self, self._client, 'publications/file/file/')
+            self._file_remotes_api = RestFileRemotesApi(self, self._client, 'remotes/file/file/')
+            self._file_repositories_api = RestFileRepositoriesApi(self, self._client, 'repositories/file/file/')
+            self._status_api = RestStatusApi(self, self._client, 'status/')
+            self._tasks_api = RestTasksApi(self, self._client, 'tasks/')
+            self._uploads_api = RestUploadsApi(self, self._client, 'uploads/')
+        else:
+            if not import_pulpcore_client():
+                self.fail_json(
+                    msg=missing_required_lib("pulpcore-client"),
+                    exception=PULPCORE_CLIENT_IMPORT_ERROR,
+                )
+            self._api_config = pulpcore.Configuration()
+            self._api_config.host = self.params['pulp_url']
+            self._api_config.username = self.params['username']
+            self._api_config.password = self.params['password']
+            self._api_config.verify_ssl = self.params['validate_certs']
+            self._api_config.safe_chars_for_path_param = '/'
+            # The pool must hold a connection for every thread that may talk to the server at once.
+            self._api_config.connection_pool_maxsize = self.params['connection_pool_maxsize'] or max(
+                [4] + [value for key, value in self.params.items() if key.endswith('_workers') and value]
+            )
+            self._client = PulpcoreApiClient(self._api_config)
+        self._file_content_class = None
+        # The caches are opened by whichever worker thread needs one first.
+        self._cache_lock = threading.Lock()
+        self._digest_cache = None
+        self._lookup_cache = None
+        self._sync_cache = None
+        # Entities retrieved by this run, by href
+        self._found_entities = {}
+        # Api and natural key of the hrefs answered by the lookup cache
+        self._cached_hrefs = {}
+        self._task_wait_time = None
+        # Tasks left running on the server, when not waiting for them
+        self._running_task_hrefs = []
+
+        # Instruments are told of every request and of every call of a helper.
+        # Without any, nothing is wrapped, so there is no cost at all.
+        self._instruments = []
+        self._metrics = None
+        if self.params['metrics']:
+            self._metrics = Metrics()
+            self._instruments.append(self._metrics)
+        if self.params['trace_file']:
+            tracer = Tracer(self.params['trace_file'].replace('{pid}', str(os.getpid())))
+            self._instruments.append(tracer)
+            atexit.register(tracer.write)
+        if self.params['profile_file']:
+            start_profile(self.params['profile_file'].replace('{pid}', str(os.getpid())))
+        if self._instruments:
+            self._instrument_client(self._client)
+            for name in INSTRUMENTED_HELPERS:
+                setattr(self, name, instrument_call(name, getattr(self, name), self._instruments))
 
         self._changed = False
 
+    def _instrument_client(self, client):
+        if self._rest:
+            instrument_rest_client(client, self._instruments)
+        else:
+            instrument_api_client(client, self._instruments)
+
+    def _import_pulp_file_client(self):
+        if not import_pulp_file_client():
+            self.fail_json(
+                msg=missing_required_lib("pulp_file-client"),
+                exception=PULP_FILE_CLIENT_IMPORT_ERROR,
+            )
+
     @property
     def artifacts_api(self):
         if not self._artifacts_api:
-            module = self
-
-            class NewArtifactsApi(pulpcore.ArtifactsApi):
-                def create(self, entity, **kwargs):
-                    size = os.stat(entity.file).st_size
-                    if size > CONTENT_CHUNK_SIZE:
-                        return module.chunked_upload(entity.file, entity.sha256, size)
-                    # TODO Why is the ArtifactsApi strange with create?
-                    payload = {
-                        'file': entity.file,
-                        'sha256': entity.sha256,
-                    }
-                    payload.update(kwargs)
-                    return super(NewArtifactsApi, self).create(**payload)
-
             self._artifacts_api = NewArtifactsApi(self._client)
+            self._artifacts_api.module = self
         return self._artifacts_api
 
     @property
     def artifact_class(self):
+        if self._rest:
+            return RestArtifact
         return pulpcore.Artifact
 
     @property
     def file_client(self):
         if not self._file_client:
-            if not HAS_PULP_FILE_CLIENT:
-                self.fail_json(
-                    msg=missing_required_lib("pulp_file-client"),
-                    exception=PULP_FILE_CLIENT_IMPORT_ERROR,
-                )
-            self._file_client = pulp_file.ApiClient(self._api_config)
+            self._import_pulp_file_client()
+            self._file_client = PulpFileApiClient(self._api_config)
+            # Share the keep-alive connections with the pulpcore client, instead of opening new ones.
+            self._file_client.rest_client.pool_manager = self._client.rest_client.pool_manager
+            if self._instruments:
+                self._instrument_client(self._file_client)
         return self._file_client
 
     @property
     def file_contents_api(self):
         if not self._file_contents_api:
-
-            class NewFileContentsApi(pulp_file.ContentFilesApi):
-                def create(self, entity, **kwargs):
-                    # TODO Why is the FileContentsApi strange with create?
-                    payload = {
-                        'artifact': entity.artifact,
-                        'relative_path': entity.relative_path,
-                    }
-                    payload.update(kwargs)
-                    return super(NewFileContentsApi, self).create(**payload)
-
-            self._file_contents_api = NewFileContentsApi(self.file_client)
+            client = self.file_client
+            self._file_contents_api = NewFileContentsApi(client)
         return self._file_contents_api
 
     @property
     def file_content_class(self):
-        module = self
-
-        class NewFileContent(pulp_file.FileFileContent):
-            def __init__(self, **kwargs):
-                # FileContent can only be searched by digest, while it wants srtifact to create.
-                if 'digest' in kwargs:
-                    artifact = module.find_entity(module.artifacts_api, {'sha256': kwargs.pop('digest')})
-                    kwargs['artifact'] = artifact.pulp_href
-                super(NewFileContent, self).__init__(**kwargs)
-
-        return NewFileContent
+        if not self._file_content_class:
+            if self._rest:
+                base_class = RestFileContent
+            else:
+                self._import_pulp_file_client()
+                base_class = pulp_file.FileFileContent
+            self._file_content_class = type('NewFileContent', (FileContentMixin, base_class), {'module': self})
+        return self._file_content_class
 
     @property
     def file_distributions_api(self):
@@ -152,17 +1249,23 @@ class PulpAnsibleModule(AnsibleModule):
 
     @property
     def file_distribution_class(self):
+        if self._rest:
+            return RestFileDistribution
+        self._import_pulp_file_client()
         return pulp_file.FileFileDistribution
 
     @property
     def file_publications_api(self):
         if not self._file_publications_api:
             client = self.file_client
-            self._file_publications_api = pulp_file.PublicationsFileApi(client)
+            self._file_publications_api = NewPublicationsFileApi(client)
         return self._file_publications_api
 
     @property
     def file_publication_class(self):
+        if self._rest:
+            return RestFilePublication
+        self._import_pulp_file_client()
         return pulp_file.FileFilePublication
 
     @property
@@ -174,6 +1277,9 @@ class PulpAnsibleModule(AnsibleModule):
 
     @property
     def file_remote_class(self):
+        if self._rest:
+            return RestFileRemote
+        self._import_pulp_file_client()
         return pulp_file.FileFileRemote
 
     @property
@@ -185,6 +1291,9 @@ class PulpAnsibleModule(AnsibleModule):
 
     @property
     def file_repository_class(self):
+        if self._rest:
+            return RestFileRepository
+        self._import_pulp_file_client()
         return pulp_file.FileFileRepository
 
     @property
@@ -205,75 +1314,545 @@ class PulpAnsibleModule(AnsibleModule):
             self._uploads_api = pulpcore.UploadsApi(self._client)
         return self._uploads_api
 
+    @property
+    def digest_cache(self):
+        with self._cache_lock:
+            if not self._digest_cache and self.params.get('digest_cache_dir'):
+                self._digest_cache = DigestCache(self.params['digest_cache_dir'], self.params.get('digest_cache_size') or 10000)
+        return self._digest_cache
+
+    @property
+    def lookup_cache(self):
+        with self._cache_lock:
+            if not self._lookup_cache and self.params.get('lookup_cache_dir'):
+                self._lookup_cache = LookupCache(self.params['lookup_cache_dir'], self.params['pulp_url'], self.params['lookup_cache_ttl'])
+        return self._lookup_cache
+
+    @property
+    def sync_cache(self):
+        with self._cache_lock:
+            if not self._sync_cache and self.params.get('sync_cache_dir'):
+                self._sync_cache = SyncCache(self.params['sync_cache_dir'], self.params['pulp_url'])
+        return self._sync_cache
+
+    def sha256(self, filename):
+        if not self.digest_cache:
+            return super(PulpAnsibleModule, self).sha256(filename)
+        identity = file_identity(filename)
+        digest = self.digest_cache.get(identity)
+        if digest is None:
+            digest = super(PulpAnsibleModule, self).sha256(filename)
+            self.digest_cache.set(identity, digest)
+        return digest
+
     def exit_json(self, changed=False, **kwargs):
         changed |= self._changed
+        if self._task_wait_time is not None:
+            kwargs['task_wait_time'] = round(self._task_wait_time, 3)
+        if self._running_task_hrefs:
+            kwargs['task_hrefs'] = self._running_task_hrefs
+        if self._metrics:
+            kwargs['pulp_metrics'] = self._metrics.report()
+        if self._lookup_cache:
+            kwargs['lookup_cache'] = {'hits': self._lookup_cache.hits, 'misses': self._lookup_cache.misses}
+        if self._digest_cache:
+            kwargs['digest_cache'] = {'hits': self._digest_cache.hits, 'misses': self._digest_cache.misses}
         super(PulpAnsibleModule, self).exit_json(changed=changed, **kwargs)
 
+    def fail_json(self, **kwargs):
+        if threading.current_thread() is not self._thread:
+            raise WorkerFailure(self, kwargs)
+        super(PulpAnsibleModule, self).fail_json(**kwargs)
+
+    def _task_deadline_passed(self, task_hrefs, start):
+        self._task_wait_time = (self._task_wait_time or 0) + time() - start
+        if self.params['task_cancel_on_timeout']:
+            for task_href in task_hrefs:
+                self.tasks_api.tasks_cancel(task_href, {'state': 'canceled'})
+        self.fail_json(
+            msg='Task did not complete within {0} seconds. ({1})'.format(self.params['task_timeout'], ', '.join(sorted(task_hrefs))),
+            task_wait_time=round(self._task_wait_time, 3),
+        )
+
+    def _wait_before_next_poll(self, intervals, start):
+        """Sleep until the next poll of running tasks.
+
+        Returns whether it is the last poll, as I(task_timeout) passes before the one after would be due.
+        The last poll happens right at the deadline, so the number of polls does not depend on how fast the server answers.
+        """
+        delay = next(intervals)
+        if self.params.get('task_timeout'):
+            remaining = start + self.params['task_timeout'] - time()
+            if remaining <= delay:
+                sleep(max(remaining, 0))
+                return True
+        sleep(delay)
+        return False
+
     def wait_for_task(self, task_href):
+        start = time()
+        intervals = task_poll_intervals()
         task = self.tasks_api.read(task_href)
-        while task.state not in ['completed', 'failed', 'canceled']:
-            sleep(2)
+        last_poll = False
+        while task.state not in TASK_FINAL_STATES:
+            if last_poll:
+                self._task_deadline_passed([task.pulp_href], start)
+            last_poll = self._wait_before_next_poll(intervals, start)
             task = self.tasks_api.read(task.pulp_href)
+        self._task_wait_time = (self._task_wait_time or 0) + time() - start
         if task.state != 'completed':
             self.fail_json(msg='Task failed to complete. ({}; {})'.format(task.state, task.error['description']))
         return task
 
-    def chunked_upload(self, path, sha256, size):
-        offset = 0
+    def handle_task(self, task_href):
+        """Wait for a task to finish, or with I(wait) false, leave it running.
+
+        Returns the finished task, or None for a task left running.
+        The hrefs of those are reported on exit, to be waited for later with pulp_task.
+        """
+        if self.params['wait']:
+            return self.wait_for_task(task_href)
+        self._running_task_hrefs.append(task_href)
+        return None
+
+    def _poll_tasks(self, task_hrefs):
+        """Yield the href and the task of each of task_hrefs that finished.
+
+        Instead of reading every task, the unfinished tasks are listed with a single query,
+        and only those of ours that dropped out of that list are read.
+        The list is never longer than task_hrefs. If the server has more unfinished tasks than that,
+        paging through all of them would cost more than reading each of ours.
+        """
+        candidates = set(task_hrefs)
+        if len(task_hrefs) > 1:
+            unfinished = self._list_page(self.tasks_api, ['pulp_href'], limit=len(task_hrefs), offset=0, state__in='waiting,running')
+            if unfinished.count <= len(task_hrefs):
+                candidates -= set(task['pulp_href'] for task in unfinished.results)
+        for task_href in candidates:
+            task = self.tasks_api.read(task_href)
+            if task.state in TASK_FINAL_STATES:
+                yield task_href, task
+
+    def wait_for_tasks(self, task_hrefs):
+        """Wait for a number of tasks, yielding each one as soon as it finished.
+
+        Failed and canceled tasks are yielded like completed ones; checking them is up to the caller.
+        """
+        start = time()
+        intervals = task_poll_intervals()
+        pending = set(task_hrefs)
+        last_poll = False
+        try:
+            while pending:
+                for task_href, task in self._poll_tasks(pending):
+                    pending.remove(task_href)
+                    yield task
+                if pending:
+                    if last_poll:
+                        self._task_deadline_passed(pending, start)
+                    last_poll = self._wait_before_next_poll(intervals, start)
+        finally:
+            self._task_wait_time = (self._task_wait_time or 0) + time() - start
+
+    def dispatch_tasks(self, start_task, items, limit):
+        """Start a task for each of items, with at most limit of them running at a time.
 
-        upload = self.uploads_api.create(pulpcore.Upload(size=size))
+        start_task is called with an item and returns the href of the task it started.
+        Yields each item with its finished task, the number of seconds since it was started,
+        and whether it timed out, as soon as the task finished.
+        I(task_timeout) applies to each task on its own. A task that exceeds it is yielded as it is then,
+        or canceled first with I(task_cancel_on_timeout), and the other items go on.
+        """
+        start = time()
+        queue = deque(items)
+        running = {}
+        timeout = self.params.get('task_timeout')
         try:
+            while queue or running:
+                if queue and len(running) < limit:
+                    while queue and len(running) < limit:
+                        item = queue.popleft()
+                        running[start_task(item)] = (item, time())
+                    # Poll quickly again for the tasks just started.
+                    intervals = task_poll_intervals()
+                delay = next(intervals)
+                if timeout:
+                    delay = min(delay, min(started for item, started in running.values()) + timeout - time())
+                sleep(max(delay, 0))
+                for task_href, task in self._poll_tasks(running):
+                    item, started = running.pop(task_href)
+                    yield item, task, time() - started, False
+                if timeout:
+                    for task_href, (item, started) in sorted(running.items()):
+                        if time() - started >= timeout:
+                            del running[task_href]
+                            task, timed_out = self._time_out_task(task_href)
+                            yield item, task, time() - started, timed_out
+        finally:
+            self._task_wait_time = (self._task_wait_time or 0) + time() - start
+
+    def _time_out_task(self, task_href):
+        """Return a task that exceeded I(task_timeout), canceled if requested, and whether it timed out after all."""
+        task = self.tasks_api.read(task_href)
+        if task.state in TASK_FINAL_STATES:
+            # It finished since the last poll.
+            return task, False
+        if self.params['task_cancel_on_timeout']:
+            task = self.tasks_api.tasks_cancel(task_href, {'state': 'canceled'})
+        return task, True
+
+    def _upload_chunk(self, upload_href, offset, chunk, size):
+        content_range = 'bytes {start}-{end}/{size}'.format(
+            start=offset,
+            end=offset + len(chunk) - 1,
+            size=size,
+        )
+        return self.uploads_api.update(
+            upload_href=upload_href,
+            file=('chunk.bin', chunk),
+            content_range=content_range,
+        )
+
+    def _resume_upload(self, upload_state):
+        # Returns the upload to continue with, and the chunks the server already has.
+        if upload_state.stale_upload_href:
+            # The file changed since; the old upload is useless.
+            try:
+                self.uploads_api.delete(upload_state.stale_upload_href)
+            except Exception as e:
+                # Either transport tells the http status of an error response.
+                if getattr(e, 'status', None) != 404:
+                    raise
+        if upload_state.upload_href:
+            try:
+                upload = self.uploads_api.read(upload_state.upload_href)
+            except Exception as e:
+                if getattr(e, 'status', None) != 404:
+                    raise
+            else:
+                return upload, set((chunk.offset, chunk.size) for chunk in upload.chunks or [])
+        return None, set()
+
+    def chunked_upload(self, path, sha256, size, workers=1, state_dir=None):
+        upload_state = None
+        upload = None
+        uploaded_chunks = set()
+        if state_dir:
+            upload_state = UploadState(state_dir, self.params['pulp_url'], path)
+            upload, uploaded_chunks = self._resume_upload(upload_state)
+        if upload is None:
+            upload = self.uploads_api.create({'size': size})
+            if upload_state:
+                upload_state.start(upload.pulp_href)
+        # The file is read exactly once, front to back, and hashed on the way.
+        file_sha256 = hashlib.sha256()
+
+        def missing_chunks(f):
+            offset = 0
+            for chunk in iter(lambda: f.read(CONTENT_CHUNK_SIZE), b""):
+                file_sha256.update(chunk)
+                if (offset, len(chunk)) not in uploaded_chunks:
+                    yield offset, chunk
+                offset += len(chunk)
+
+        try:
+            # Chunks are independent of each other, so they can be sent in parallel.
+            # Commit only happens after every single one has been acknowledged.
             with open(path, 'rb') as f:
-                for chunk in iter(lambda: f.read(CONTENT_CHUNK_SIZE), b""):
-                    actual_chunk_size = len(chunk)
-                    content_range = 'bytes {start}-{end}/{size}'.format(
-                        start=offset,
-                        end=offset + actual_chunk_size - 1,
-                        size=size,
-                    )
-                    temp_dir = mkdtemp(dir="/tmp")
-                    try:
-                        chunk_file_name = os.path.join(temp_dir, 'chunk.bin')
-                        with open(chunk_file_name, 'wb') as chunk_file:
-                            chunk_file.write(chunk)
-                        upload = self.uploads_api.update(
-                            upload_href=upload.pulp_href,
-                            file=chunk_file_name,
-                            content_range=content_range,
-                        )
-                    finally:
-                        rmtree(temp_dir)
-                    offset += actual_chunk_size
-
-                commit_response = self.uploads_api.commit(
-                    upload.pulp_href, pulpcore.UploadCommit(sha256=sha256)
-                )
-                commit_task = self.wait_for_task(commit_response.task)
-                artifact = self.artifacts_api.read(commit_task.created_resources[0])
+                for _ in threaded_imap(
+                    lambda item: self._upload_chunk(upload.pulp_href, item[0], item[1], size),
+                    missing_chunks(f),
+                    workers,
+                ):
+                    pass
+        except Exception:
+            # A resumable upload is kept on the server to be continued by the next run.
+            if not upload_state:
+                self.uploads_api.delete(upload.pulp_href)
+            raise
+
+        if upload_state:
+            upload_state.remove()
+        if sha256 != file_sha256.hexdigest():
+            self.uploads_api.delete(upload.pulp_href)
+            self.fail_json(msg="File checksum mismatch.")
+        if self.digest_cache:
+            self.digest_cache.set(file_identity(path), sha256)
+        try:
+            commit_response = self.uploads_api.commit(upload.pulp_href, {'sha256': sha256})
+            commit_task = self.wait_for_task(commit_response.task)
+            artifact = self.artifacts_api.read(commit_task.created_resources[0])
         except Exception:
             self.uploads_api.delete(upload.pulp_href)
             raise
 
         return artifact
 
-    def list_entities(self, entity_api):
-        entities = []
-        offset = 0
-        search_result = entity_api.list(limit=PAGE_LIMIT, offset=offset)
-        entities.extend(search_result.results)
-        while search_result.next:
-            offset += PAGE_LIMIT
-            search_result = entity_api.list(limit=PAGE_LIMIT, offset=offset)
-            entities.extend(search_result.results)
-        return entities
+    def _list_page(self, entity_api, fields, **kwargs):
+        if fields is None:
+            return entity_api.list(**kwargs)
+        # Dicts of just the requested fields are a lot lighter than full model objects.
+        if self._rest:
+            page = entity_api.client.list(entity_api.path, fields=','.join(fields), **kwargs)
+        else:
+            response = entity_api.list(fields=','.join(fields), _preload_content=False, **kwargs)
+            page = json.loads(response.data.decode('utf-8'))
+        return ListPage(
+            results=[dict((key, item.get(key)) for key in fields) for item in page['results']],
+            count=page['count'],
+            next=page['next'],
+        )
+
+    def iterate_entities(self, entity_api, fields=None, **query):
+        """Yield all entities matching query, fetching them page by page.
+
+        Only a few pages are held in memory at any time. If fields is given, the entities are
+        yielded as dicts restricted to those fields, instead of model objects.
+        """
+        page_size = self.params.get('page_size') or PAGE_LIMIT
+        search_result = self._list_page(entity_api, fields, limit=page_size, offset=0, **query)
+        for entity in search_result.results:
+            yield entity
+        if search_result.next:
+            # Knowing the count, all remaining pages can be fetched concurrently.
+            offsets = range(page_size, search_result.count, page_size)
+            for search_result in threaded_imap(
+                lambda offset: self._list_page(entity_api, fields, limit=page_size, offset=offset, **query),
+                offsets,
+                self.params.get('list_workers') or 1,
+            ):
+                for entity in search_result.results:
+                    yield entity
+            # Pick up anything that was added in the meantime.
+            offset = offsets[-1] if offsets else 0
+            while search_result.next:
+                offset += page_size
+                search_result = self._list_page(entity_api, fields, limit=page_size, offset=offset, **query)
+                for entity in search_result.results:
+                    yield entity
+
+    def list_entities(self, entity_api, fields=None, **query):
+        return list(self.iterate_entities(entity_api, fields=fields, **query))
+
+    def hash_files(self, paths):
+        """Return the sha256 digests of local files by path, hashing hash_workers of them in parallel."""
+        return dict(zip(paths, threaded_imap(self.sha256, paths, self.params.get('hash_workers') or 1)))
+
+    def find_artifact_hrefs(self, digests):
+        """Return the hrefs of the artifacts present on the server by sha256, out of digests.
+
+        A few digests are queried individually, list_workers at a time.
+        For more than fit on a page, listing all artifacts is cheaper.
+        """
+        digests = set(digests)
+        if len(digests) > (self.params.get('page_size') or PAGE_LIMIT):
+            artifacts = self.iterate_entities(self.artifacts_api, fields=['pulp_href', 'sha256'])
+        else:
+            artifacts = (
+                artifact
+                for search_result in threaded_imap(
+                    lambda digest: self._list_page(self.artifacts_api, ['pulp_href', 'sha256'], sha256=digest),
+                    sorted(digests),
+                    self.params.get('list_workers') or 1,
+                )
+                for artifact in search_result.results
+            )
+        return dict((artifact['sha256'], artifact['pulp_href']) for artifact in artifacts if artifact['sha256'] in digests)
+
+    def upload_artifacts(self, files):
+        """Upload local files as artifacts, upload_workers of them in parallel.
+
+        files maps sha256 digests to paths. Returns the hrefs of the new artifacts by digest.
+        The chunks of each single file are sent one after another.
+        """
+        def upload(item):
+            digest, path = item
+            if self.check_mode:
+                return digest, None
+            artifact = self.artifacts_api.create(self.artifact_class(file=path, sha256=digest), upload_workers=1)
+            return digest, artifact.pulp_href
+
+        if files:
+            self._changed = True
+        return dict(threaded_imap(upload, sorted(files.items()), self.params.get('upload_workers') or 1))
+
+    def find_file_content_hrefs(self, units):
+        """Return the hrefs of the file content units present on the server by (digest, relative_path), out of units.
+
+        Like find_artifact_hrefs, a few units are queried individually, and more than fit on a page
+        are looked up by listing all file content.
+        """
+        units = set(units)
+        fields = ['pulp_href', 'sha256', 'relative_path']
+        if len(units) > (self.params.get('page_size') or PAGE_LIMIT):
+            contents = self.iterate_entities(self.file_contents_api, fields=fields)
+        else:
+            contents = (
+                content
+                for search_result in threaded_imap(
+                    lambda unit: self._list_page(self.file_contents_api, fields, digest=unit[0], relative_path=unit[1]),
+                    sorted(units),
+                    self.params.get('list_workers') or 1,
+                )
+                for content in search_result.results
+            )
+        return dict(
+            ((content['sha256'], content['relative_path']), content['pulp_href'])
+            for content in contents
+            if (content['sha256'], content['relative_path']) in units
+        )
+
+    def create_file_contents(self, units):
+        """Create file content units, and wait for all of their tasks together.
+
+        units maps (artifact href, relative_path) tuples to arbitrary keys, by which the hrefs of the new
+        content units are returned. The create requests are sent create_workers at a time.
+        """
+        if not units:
+            return {}
+        self._changed = True
+        if self.check_mode:
+            return dict((key, None) for key in units.values())
+
+        def create(unit):
+            artifact_href, relative_path = unit
+            response = self.file_contents_api.create(self.file_content_class(artifact=artifact_href, relative_path=relative_path))
+            return response.task, units[unit]
+
+        tasks = dict(threaded_imap(create, sorted(units), self.params.get('create_workers') or 1))
+        content_hrefs = {}
+        failed_tasks = []
+        for task in self.wait_for_tasks(tasks):
+            if task.state == 'completed':
+                content_hrefs[tasks[task.pulp_href]] = task.created_resources[0]
+            else:
+                failed_tasks.append('{0}; {1}'.format(task.state, (task.error or {}).get('description')))
+        if failed_tasks:
+            self.fail_json(msg='Task failed to complete. ({0})'.format(', '.join(failed_tasks)))
+        return content_hrefs
+
+    def find_repository_content(self, repository_version_href):
+        """Return the file content units in a repository version, as (digest, relative_path) by href."""
+        if not repository_version_href:
+            return {}
+        contents = self.iterate_entities(
+            self.file_contents_api,
+            fields=['pulp_href', 'sha256', 'relative_path'],
+            repository_version=repository_version_href,
+        )
+        return dict((content['pulp_href'], (content['sha256'], content['relative_path'])) for content in contents)
+
+    def modify_repository(self, repository_href, add_content_units, remove_content_units, base_version=None):
+        """Add and remove content units in one go, resulting in a single new repository version.
+
+        Returns the href of the new repository version, or None if there was nothing to change or in check mode.
+        """
+        if not (add_content_units or remove_content_units):
+            return None
+        self._changed = True
+        if self.check_mode:
+            return None
+        data = {
+            'add_content_units': sorted(add_content_units),
+            'remove_content_units': sorted(remove_content_units),
+        }
+        if base_version:
+            data['base_version'] = base_version
+        response = self.file_repositories_api.modify(repository_href, data)
+        modify_task = self.wait_for_task(response.task)
+        self._found_entities.pop(repository_href, None)
+        return modify_task.created_resources[0] if modify_task.created_resources else None
+
+    def _entity_type(self, entity_api):
+        # The api classes are named differently by transport, but both share the lookup cache.
+        for entity_name, entity_plural in ENTITY_TYPES.items():
+            if getattr(self, '_{0}_api'.format(entity_plural)) is entity_api:
+                return entity_name
+        return type(entity_api).__name__
 
     def find_entity(self, entity_api, natural_key):
         search_result = entity_api.list(**natural_key)
         if search_result.count == 1:
-            return search_result.results[0]
+            entity = search_result.results[0]
+            self._found_entities[entity.pulp_href] = entity
+            if self.lookup_cache:
+                self.lookup_cache.set(self._entity_type(entity_api), natural_key, entity.pulp_href)
+            return entity
         else:
+            if self.lookup_cache:
+                self.lookup_cache.invalidate(self._entity_type(entity_api), natural_key=natural_key)
             return None
 
+    def find_entity_href(self, entity_api, natural_key):
+        """Find the href of an entity by its natural key.
+
+        Other than find_entity, this may be answered by the lookup cache without asking the server.
+        Should the entity be gone since, read_entity and call_with_cached_hrefs look it up again.
+        """
+        if self.lookup_cache:
+            pulp_href = self.lookup_cache.get(self._entity_type(entity_api), natural_key)
+            if pulp_href:
+                self._cached_hrefs[pulp_href] = (entity_api, natural_key)
+                return pulp_href
+        entity = self.find_entity(entity_api, natural_key)
+        return entity.pulp_href if entity else None
+
+    def _find_again(self, pulp_href):
+        # The entity of an href answered by the lookup cache is gone, so its entry is replaced.
+        entity_api, natural_key = self._cached_hrefs.pop(pulp_href)
+        entity = self.find_entity(entity_api, natural_key)
+        if entity is None:
+            self.fail_json(msg="{0} '{1}' not found.".format(self._entity_type(entity_api), "', '".join(str(value) for value in natural_key.values())))
+        return entity
+
+    def call_with_cached_hrefs(self, func, *hrefs):
+        """Call func with hrefs, that may have been answered by the lookup cache.
+
+        If the server refuses the call, because one of those entities is gone since,
+        they are looked up again, and func is called once more with the new hrefs.
+        """
+        try:
+            return func(*hrefs)
+        except Exception as e:
+            # A missing entity is reported as 404, a missing one referred to in the body as 400.
+            if getattr(e, 'status', None) not in (400, 404) or not any(href in self._cached_hrefs for href in hrefs):
+                raise
+        return func(*[self._find_again(href).pulp_href if href in self._cached_hrefs else href for href in hrefs])
+
+    def find_entities_by_name(self, entity_api, names):
+        """Return the entities with any of names, by name.
+
+        They are fetched with a single name__in listing, or by listing all entities if there are more names than fit on a page.
+        """
+        names = set(names)
+        if not names:
+            return {}
+        if len(names) > (self.params.get('page_size') or PAGE_LIMIT):
+            entities = self.iterate_entities(entity_api)
+        else:
+            entities = self.iterate_entities(entity_api, name__in=','.join(sorted(names)))
+        found_entities = {}
+        for entity in entities:
+            if entity.name in names:
+                self._found_entities[entity.pulp_href] = entity
+                found_entities[entity.name] = entity
+        return found_entities
+
+    def read_entity(self, entity_api, pulp_href):
+        """Read an entity, reusing it if it was already retrieved by this run.
+
+        If the href was answered by the lookup cache, and the entity is gone since, it is looked up again.
+        The entity returned has a different href then.
+        """
+        if pulp_href not in self._found_entities:
+            try:
+                self._found_entities[pulp_href] = entity_api.read(pulp_href)
+            except Exception as e:
+                if getattr(e, 'status', None) != 404 or pulp_href not in self._cached_hrefs:
+                    raise
+                return self._find_again(pulp_href)
+        return self._found_entities[pulp_href]
+
     def create_entity(self, entity_api, entity_class, natural_key, desired_attributes):
         if not hasattr(entity_api, 'create'):
             self.fail_json(msg="This entity is not creatable.")
@@ -284,54 +1863,80 @@ class PulpAnsibleModule(AnsibleModule):
         if not self.check_mode:
             response = entity_api.create(entity)
             if getattr(response, 'task', None):
-                task = self.wait_for_task(response.task)
-                entity = entity_api.read(task.created_resources[0])
+                task = self.handle_task(response.task)
+                if task is not None:
+                    entity = entity_api.read(task.created_resources[0])
             else:
                 entity = response
+            if self.lookup_cache and getattr(entity, 'pulp_href', None):
+                self.lookup_cache.set(self._entity_type(entity_api), natural_key, entity.pulp_href)
         self._changed = True
         return entity
 
     def update_entity(self, entity_api, entity, desired_attributes):
-        changed = False
+        return self._update_entity(entity_api, entity, desired_attributes)[0]
+
+    def _update_entity(self, entity_api, entity, desired_attributes):
+        """Update entity to have desired_attributes, and return it along with whether anything changed."""
+        changed_attributes = {}
         # drop 'file' because artifacts as well as content units are immutable anyway
         desired_attributes.pop('file', None)
         for key, value in desired_attributes.items():
             if getattr(entity, key, None) != value:
                 setattr(entity, key, value)
-                changed = True
+                changed_attributes[key] = value
+        changed = bool(changed_attributes)
         if changed:
             if not hasattr(entity_api, 'update'):
                 self.fail_json(msg="This entity is immutable.")
             if not self.check_mode:
-                response = entity_api.update(entity.pulp_href, entity)
+                self._found_entities.pop(entity.pulp_href, None)
+                if self.lookup_cache:
+                    self.lookup_cache.invalidate(self._entity_type(entity_api), pulp_href=entity.pulp_href)
+                # The rest transport sends a partial update of just the changed attributes.
+                response = entity_api.update(entity.pulp_href, changed_attributes if self._rest else entity)
                 if getattr(response, 'task', None):
-                    self.wait_for_task(response.task)
-                    entity = entity_api.read(entity.pulp_href)
+                    if self.handle_task(response.task) is not None:
+                        entity = entity_api.read(entity.pulp_href)
                 else:
                     entity = response
         if changed:
             self._changed = True
-        return entity
+        return entity, changed
 
     def delete_entity(self, entity_api, entity):
         if not hasattr(entity_api, 'delete'):
             self.fail_json(msg="This entity is not deletable.")
         if not self.check_mode:
+            self._found_entities.pop(entity.pulp_href, None)
+            if self.lookup_cache:
+                self.lookup_cache.invalidate(self._entity_type(entity_api), pulp_href=entity.pulp_href)
             response = entity_api.delete(entity.pulp_href)
             if getattr(response, 'task', None):
-                self.wait_for_task(response.task)
+                self.handle_task(response.task)
         self._changed = True
         return None
 
-    def ensure_entity_state(self, entity_api, entity_class, entity, natural_key, desired_attributes):
-        if self.params['state'] == 'present':
+    def ensure_entity_state(self, entity_api, entity_class, entity, natural_key, desired_attributes, state=None):
+        return self.reconcile_entity(entity_api, entity_class, entity, natural_key, desired_attributes, state)[0]
+
+    def reconcile_entity(self, entity_api, entity_class, entity, natural_key, desired_attributes, state=None):
+        """Like ensure_entity_state, but return whether this entity changed too.
+
+        _changed only tells whether anything changed in the whole module run.
+        """
+        state = state or self.params['state']
+        changed = False
+        if state == 'present':
             if entity:
-                entity = self.update_entity(entity_api, entity, desired_attributes)
+                entity, changed = self._update_entity(entity_api, entity, desired_attributes)
             else:
                 entity = self.create_entity(entity_api, entity_class, natural_key, desired_attributes)
-        if self.params['state'] == 'absent' and entity is not None:
+                changed = True
+        if state == 'absent' and entity is not None:
             entity = self.delete_entity(entity_api, entity)
-        return entity
+            changed = True
+        return entity, changed
 
 
 class PulpEntityAnsibleModule(PulpAnsibleModule):
@@ -342,6 +1947,9 @@ class PulpEntityAnsibleModule(PulpAnsibleModule):
             state=dict(
                 choices=['present', 'absent'],
             ),
+            fields=dict(type='list'),
+            count_only=dict(type='bool', default=False),
+            filters=dict(type='dict'),
         )
         spec.update(argument_spec)
         super(PulpEntityAnsibleModule, self).__init__(
@@ -357,16 +1965,49 @@ class PulpEntityAnsibleModule(PulpAnsibleModule):
                 entity_api=self._entity_api,
                 natural_key=natural_key,
             )
-            entity = self.ensure_entity_state(
-                entity_api=self._entity_api,
-                entity_class=self._entity_class,
-                entity=entity,
-                natural_key=natural_key,
-                desired_attributes=desired_attributes,
-            )
-            if entity:
-                entity = entity.to_dict()
-            self.exit_json(**{self._entity_name: entity})
+            self.process_found_entity(entity, natural_key, desired_attributes)
         else:
-            entities = self.list_entities(self._entity_api)
-            self.exit_json(**{self._entity_plural: [entity.to_dict() for entity in entities]})
+            self.process_entity_list()
+
+    def process_found_entity(self, entity, natural_key, desired_attributes):
+        """Like process_entity, for an entity the module already looked up by natural_key, or None if there is none."""
+        entity = self.ensure_entity_state(
+            entity_api=self._entity_api,
+            entity_class=self._entity_class,
+            entity=entity,
+            natural_key=natural_key,
+            desired_attributes=desired_attributes,
+        )
+        if entity:
+            entity = entity.to_dict()
+        self.exit_json(**{self._entity_name: entity})
+
+    def process_entity_list(self):
+        # Filters are evaluated by the server, e.g. name__in or pulp_created__gte.
+        filters = dict(
+            (key, ','.join(str(item) for item in value) if isinstance(value, list) else value)
+            for key, value in (self.params['filters'] or {}).items()
+        )
+        if self.params['count_only']:
+            try:
+                count = self._entity_api.list(limit=1, **filters).count
+            except TypeError as e:
+                self._unsupported_filter(filters, e)
+            self.exit_json(count=count)
+        fields = self.params['fields']
+        entities = self.iterate_entities(self._entity_api, fields=fields, **filters)
+        try:
+            # The first page is requested here, so a refused filter shows right away.
+            first_entities = list(islice(entities, 1))
+        except TypeError as e:
+            self._unsupported_filter(filters, e)
+        entities = chain(first_entities, entities)
+        if not fields:
+            entities = (entity.to_dict() for entity in entities)
+        self.exit_json(**{self._entity_plural: list(entities)})
+
+    def _unsupported_filter(self, filters, error):
+        # The api clients refuse unknown query parameters.
+        if not filters:
+            raise error
+        self.fail_json(msg="Unsupported filter. ({0})".format(error))
@@ -25,11 +25,66 @@ options:
     description:
       - A local file that should be turned into an artifact.
     type: path
+  files:
+    description:
+      - A list of local files that should be turned into artifacts.
+      - They are handled all at once, which is a lot faster than looping over I(file).
+      - The module fails, before touching any artifact, if one of them does not exist.
+      - Mutually exclusive with I(file) and I(src_dir).
+    type: list
+    elements: path
+  src_dir:
+    description:
+      - A local directory, whose files matching I(pattern) should be turned into artifacts.
+      - Subdirectories are searched too.
+      - Mutually exclusive with I(file) and I(files).
+    type: path
+  pattern:
+    description:
+      - Shell style pattern the paths of files in I(src_dir) must match, relative to I(src_dir).
+      - C(*) matches across directories as well.
+    type: str
+    default: '*'
   sha256:
     description:
       - sha256 digest of the artifact to query or delete.
       - When specified together with file, it will be used to verify any transaction.
+      - In that case, a file larger than a single chunk is hashed while being uploaded, instead of in a separate pass beforehand.
     type: str
+  upload_workers:
+    description:
+      - Number of chunks of a large file to be uploaded in parallel.
+      - With I(files) or I(src_dir), the number of files to be uploaded in parallel.
+    type: int
+    default: 1
+  hash_workers:
+    description:
+      - With I(files) or I(src_dir), the number of files to be hashed in parallel.
+    type: int
+    default: 4
+  delete_workers:
+    description:
+      - With I(files) or I(src_dir), the number of artifacts to be deleted in parallel.
+    type: int
+    default: 4
+  upload_state_dir:
+    description:
+      - Directory to keep track of chunked uploads in.
+      - When specified, an upload that failed midway is not deleted, but continued by the next run for the same file.
+      - Only the chunks that the server is missing are sent again.
+    type: path
+  digest_cache_dir:
+    description:
+      - Directory to cache the sha256 digests of local files in.
+      - When specified, files that did not change since they were last hashed are not read again.
+      - The numbers of files found in and missing from the cache are returned as C(digest_cache.hits) and C(digest_cache.misses).
+    type: path
+  digest_cache_size:
+    description:
+      - Maximum number of entries in the digest cache.
+      - The least recently used entries are evicted first.
+    type: int
+    default: 10000
   state:
     description:
       - State the artifact should be in
@@ -38,6 +93,7 @@ options:
       - absent
 extends_documentation_fragment:
   - pulp
+  - pulp.entity
 author:
   - Matthias Dellweg (@mdellweg)
 '''
@@ -52,6 +108,15 @@ EXAMPLES = r'''
 - name: Report pulp artifacts
   debug:
     var: artifact_status
+- name: Read only the digests of all artifacts
+  pulp_artifact:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    fields:
+      - pulp_href
+      - sha256
+  register: artifact_digests
 - name: Upload a file
   pulp_artifact:
     api_url: localhost:24817
@@ -59,6 +124,35 @@ EXAMPLES = r'''
     password: password
     file: local_artifact.txt
     state: present
+- name: Upload a large file in 8 parallel chunks
+  pulp_artifact:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    file: large_image.iso
+    upload_workers: 8
+    state: present
+- name: Upload a large file over a flaky connection, retrying where it failed
+  pulp_artifact:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    file: large_image.iso
+    upload_state_dir: ~/.cache/pulp_uploads
+    state: present
+  register: upload_result
+  until: upload_result is succeeded
+  retries: 5
+- name: Upload a whole release tree
+  pulp_artifact:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    src_dir: build/release
+    pattern: "*.rpm"
+    upload_workers: 8
+    state: present
+  register: release_artifacts
 - name: Delete an artifact by specifying a file
   pulp_atifact:
     api_url: localhost:24817
@@ -79,32 +173,108 @@ RETURN = r'''
   artifacts:
     description: List of artifacts
     type: list
-    return: when no file or sha256 is given
+    return: when no file or sha256 is given, unless count_only is set
+  count:
+    description: Number of artifacts
+    type: int
+    return: when count_only is set
   artifact:
     description: Artifact details
     type: dict
     return: when file or sha256 is given
+  file_artifacts:
+    description: Digest, href and whether it was changed of the artifact of each local file
+    type: dict
+    return: when files or src_dir is given
+    sample:
+      build/release/package.rpm:
+        sha256: 0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef
+        pulp_href: /pulp/api/v3/artifacts/aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa/
+        changed: true
 '''
 
 
-from ansible.module_utils.pulp_helper import PulpEntityAnsibleModule
+import os
+
+from ansible.module_utils.pulp_helper import (
+    CONTENT_CHUNK_SIZE,
+    PulpEntityAnsibleModule,
+    find_files,
+    threaded_imap,
+)
+
+
+def process_files(module, paths):
+    missing_paths = [path for path in paths if not os.path.isfile(path)]
+    if missing_paths:
+        module.fail_json(msg="Files '{0}' not found.".format("', '".join(missing_paths)), missing_files=missing_paths)
+    digests = module.hash_files(paths)
+    artifact_hrefs = module.find_artifact_hrefs(digests.values())
+    changed_digests = set()
+    if module.params['state'] == 'present':
+        missing = dict((digest, path) for path, digest in digests.items() if digest not in artifact_hrefs)
+        artifact_hrefs.update(module.upload_artifacts(missing))
+        changed_digests.update(missing)
+    elif module.params['state'] == 'absent':
+        if artifact_hrefs and not module.check_mode:
+            for _ in threaded_imap(module.artifacts_api.delete, artifact_hrefs.values(), module.params['delete_workers']):
+                pass
+        changed_digests.update(artifact_hrefs)
+        artifact_hrefs = {}
+    module.exit_json(
+        changed=bool(changed_digests),
+        file_artifacts=dict(
+            (path, {'sha256': digest, 'pulp_href': artifact_hrefs.get(digest), 'changed': digest in changed_digests})
+            for path, digest in digests.items()
+        ),
+    )
 
 
 def main():
     module = PulpEntityAnsibleModule(
         argument_spec=dict(
             file=dict(),
+            files=dict(type='list', elements='path'),
+            src_dir=dict(type='path'),
+            pattern=dict(default='*'),
             sha256=dict(),
+            upload_workers=dict(type='int', default=1),
+            hash_workers=dict(type='int', default=4),
+            delete_workers=dict(type='int', default=4),
+            upload_state_dir=dict(type='path'),
+            digest_cache_dir=dict(type='path'),
+            digest_cache_size=dict(type='int', default=10000),
         ),
         required_if=[
-            ('state', 'present', ['file']),
+            ('state', 'present', ['file', 'files', 'src_dir'], True),
+        ],
+        mutually_exclusive=[
+            ('file', 'files', 'src_dir'),
+            ('sha256', 'files'),
+            ('sha256', 'src_dir'),
         ],
         entity_name='artifact',
         entity_plural='artifacts',
     )
 
+    if module.params['files'] is not None:
+        process_files(module, module.params['files'])
+    if module.params['src_dir']:
+        process_files(module, find_files(module.params['src_dir'], module.params['pattern']))
+
     sha256 = module.params['sha256']
-    if module.params['file']:
+    # With a known digest, a large file that needs to be uploaded is verified while it is uploaded, and only read once.
+    # Any other file is checked right away, which costs at most a single chunk for a small one.
+    # In check mode nothing is uploaded, so the file is checked right away as well.
+    looked_up = False
+    artifact = None
+    check_while_uploading = False
+    if sha256 and module.params['state'] == 'present' and module.params['file'] and os.path.isfile(module.params['file']):
+        if os.path.getsize(module.params['file']) > CONTENT_CHUNK_SIZE and not module.check_mode:
+            artifact = module.find_entity(module.artifacts_api, {'sha256': sha256})
+            looked_up = True
+            check_while_uploading = artifact is None
+    if module.params['file'] and not check_while_uploading:
         file_sha256 = module.sha256(module.params['file'])
         if sha256:
             if sha256 != file_sha256:
@@ -122,6 +292,8 @@ def main():
         'file': module.params['file'],
     }
 
+    if looked_up:
+        module.process_found_entity(artifact, natural_key, desired_attributes)
     module.process_entity(natural_key, desired_attributes)
 
 
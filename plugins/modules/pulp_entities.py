@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2019, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+
+DOCUMENTATION = r'''
+---
+module: pulp_entities
+short_description: Manage many named entities of a pulp api server instance at once
+version_added: "2.8"
+description:
+  - "This performes CRUD operations on a list of entities of one type in a pulp api server instance."
+  - "It is a lot faster than looping over the module of that entity type, as all entities are handled by a single process."
+options:
+  entity_type:
+    description:
+      - Type of the entities
+    type: str
+    required: true
+    choices:
+      - file_distribution
+      - file_remote
+      - file_repository
+  entities:
+    description:
+      - List of entities. Each one needs a C(name), and may have a C(state) overriding I(state).
+      - All other keys are attributes of the entity, like they are passed to the module of the entity type.
+        They are checked, and required depending on the state, just like the options of that module.
+    type: list
+    elements: dict
+    required: true
+  state:
+    description:
+      - State the entities should be in, unless given for an entity.
+    type: str
+    default: present
+    choices:
+      - present
+      - absent
+  reconcile_workers:
+    description:
+      - Number of entities to be created, updated or deleted in parallel.
+    type: int
+    default: 4
+extends_documentation_fragment:
+  - pulp
+author:
+  - Matthias Dellweg (@mdellweg)
+'''
+
+EXAMPLES = r'''
+- name: Create file remotes for all mirrored repositories
+  pulp_entities:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    entity_type: file_remote
+    entities: "{{ mirrored_repositories | map('combine', {'policy': 'on-demand'}) | list }}"
+- name: Create file repositories, and delete an obsolete one
+  pulp_entities:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    entity_type: file_repository
+    entities:
+      - name: file_repo_1
+        description: First repository
+      - name: file_repo_2
+      - name: file_repo_old
+        state: absent
+'''
+
+RETURN = r'''
+  entities:
+    description: Name, state, whether it was changed, and details of each entity, in the order of I(entities)
+    type: list
+    sample:
+      - name: file_repo_1
+        state: present
+        changed: true
+        entity:
+          name: file_repo_1
+          description: First repository
+          pulp_href: /pulp/api/v3/repositories/file/file/aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa/
+'''
+
+
+from ansible.module_utils._text import to_native
+from ansible.module_utils.common.validation import (
+    check_required_if,
+    check_type_bool,
+    check_type_int,
+    check_type_str,
+)
+from ansible.module_utils.pulp_helper import (
+    ENTITY_ATTRIBUTES_SPECS,
+    ENTITY_REQUIRED_IF,
+    ENTITY_TYPES,
+    PulpAnsibleModule,
+    threaded_imap,
+)
+
+
+TYPE_CHECKERS = {
+    'bool': check_type_bool,
+    'int': check_type_int,
+    'str': check_type_str,
+}
+
+
+def validate_attributes(module, name, state, attributes, spec, required_if):
+    """Check the attributes of an entity like the module of its type checks its options, and convert them the same way."""
+    unsupported = sorted(set(attributes) - set(spec))
+    if unsupported:
+        module.fail_json(msg="Unsupported parameters for entity '{0}': {1}. Supported parameters include: {2}".format(
+            name, ', '.join(unsupported), ', '.join(sorted(['name', 'state'] + list(spec)))
+        ))
+    desired_attributes = {}
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        option_type = spec[key].get('type', 'str')
+        try:
+            value = TYPE_CHECKERS[option_type](value)
+        except (TypeError, ValueError) as e:
+            module.fail_json(msg="Argument {0} of entity '{1}' could not be converted to {2}: {3}".format(key, name, option_type, to_native(e)))
+        choices = spec[key].get('choices')
+        if choices and value not in choices:
+            module.fail_json(msg="Argument {0} of entity '{1}' must be one of: {2}, got: {3}".format(key, name, ', '.join(choices), value))
+        desired_attributes[key] = value
+    try:
+        check_required_if(required_if, dict(desired_attributes, name=name, state=state))
+    except TypeError as e:
+        module.fail_json(msg="Entity '{0}': {1}".format(name, to_native(e)))
+    return desired_attributes
+
+
+def main():
+    module = PulpAnsibleModule(
+        argument_spec=dict(
+            entity_type=dict(required=True, choices=sorted(ENTITY_ATTRIBUTES_SPECS)),
+            entities=dict(type='list', elements='dict', required=True),
+            state=dict(default='present', choices=['present', 'absent']),
+            reconcile_workers=dict(type='int', default=4),
+        ),
+    )
+
+    entity_api = getattr(module, ENTITY_TYPES[module.params['entity_type']] + '_api')
+    entity_class = getattr(module, module.params['entity_type'] + '_class')
+
+    desired_entities = []
+    for item in module.params['entities']:
+        item = dict(item)
+        name = item.pop('name', None)
+        if not name:
+            module.fail_json(msg="Each entity needs a name.")
+        state = item.pop('state', None) or module.params['state']
+        if state not in ('present', 'absent'):
+            module.fail_json(msg="Invalid state '{0}' of entity '{1}'.".format(state, name))
+        desired_attributes = validate_attributes(
+            module,
+            name,
+            state,
+            item,
+            ENTITY_ATTRIBUTES_SPECS[module.params['entity_type']],
+            ENTITY_REQUIRED_IF[module.params['entity_type']],
+        )
+        desired_entities.append((name, state, desired_attributes))
+    names = [name for name, state, desired_attributes in desired_entities]
+    if len(set(names)) != len(names):
+        module.fail_json(msg="Entity names must be unique.")
+
+    current_entities = module.find_entities_by_name(entity_api, names)
+
+    def reconcile(desired_entity):
+        name, state, desired_attributes = desired_entity
+        entity, changed = module.reconcile_entity(
+            entity_api=entity_api,
+            entity_class=entity_class,
+            entity=current_entities.get(name),
+            natural_key={'name': name},
+            desired_attributes=desired_attributes,
+            state=state,
+        )
+        return {
+            'name': name,
+            'state': state,
+            'changed': changed,
+            'entity': entity.to_dict() if entity is not None else None,
+        }
+
+    module.exit_json(entities=list(threaded_imap(reconcile, desired_entities, module.params['reconcile_workers'])))
+
+
+if __name__ == '__main__':
+    main()
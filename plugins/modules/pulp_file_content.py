@@ -29,6 +29,32 @@ options:
     description:
       - Relative path of the file content unit
     type: str
+  units:
+    description:
+      - A list of file content units, each given by I(digest) and I(relative_path).
+      - They are handled all at once, which is a lot faster than looping over I(digest) and I(relative_path).
+      - The artifacts for all digests must already be present on the server.
+      - File content cannot be deleted, so with I(state=absent) this fails if any of the units is present.
+      - Mutually exclusive with I(digest) and I(relative_path).
+    type: list
+    elements: dict
+    suboptions:
+      digest:
+        description:
+          - sha256 digest of the file content
+        type: str
+        required: true
+      relative_path:
+        description:
+          - Relative path of the file content unit
+        type: str
+        required: true
+  create_workers:
+    description:
+      - With I(units), the number of file content units whose creation is requested in parallel.
+      - All of the resulting tasks are waited for together.
+    type: int
+    default: 4
   state:
     description:
       - State the file content unit should be in
@@ -38,6 +64,7 @@ options:
       - absent
 extends_documentation_fragment:
   - pulp
+  - pulp.entity
 author:
   - Matthias Dellweg (@mdellweg)
 '''
@@ -60,6 +87,17 @@ EXAMPLES = r'''
     digest: 0000111122223333444455556666777788889999aaaabbbbccccddddeeeeffff
     relative_path: "data/important_file.txt"
     state: present
+- name: Create many file content units at once
+  pulp_file_content:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    units:
+      - digest: 0000111122223333444455556666777788889999aaaabbbbccccddddeeeeffff
+        relative_path: "data/important_file.txt"
+      - digest: ffffeeeeddddccccbbbbaaaa9999888877776666555544443333222211110000
+        relative_path: "data/other_file.txt"
+    state: present
 '''
 
 RETURN = r'''
@@ -71,6 +109,15 @@ RETURN = r'''
     description: File content unit details
     type: dict
     return: when digest and relative_path is given
+  file_content_units:
+    description: Digest, relative path, href and whether it was changed of each file content unit in units
+    type: list
+    return: when units is given
+    sample:
+      - digest: 0000111122223333444455556666777788889999aaaabbbbccccddddeeeeffff
+        relative_path: data/important_file.txt
+        pulp_href: /pulp/api/v3/content/file/files/aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa/
+        changed: true
 '''
 
 
@@ -79,20 +126,69 @@ from ansible.module_utils.pulp_helper import (
 )
 
 
+def process_units(module, units):
+    units = [(unit['digest'], unit['relative_path']) for unit in units]
+    content_hrefs = module.find_file_content_hrefs(units)
+    if content_hrefs and module.params['state'] == 'absent':
+        # Units that are not there already are as absent as can be.
+        module.fail_json(msg="This entity is not deletable.")
+    missing = [unit for unit in units if unit not in content_hrefs]
+    if missing and module.params['state'] == 'present':
+        artifact_hrefs = module.find_artifact_hrefs(digest for digest, relative_path in missing)
+        missing_artifacts = sorted(set(digest for digest, relative_path in missing if digest not in artifact_hrefs))
+        if missing_artifacts:
+            module.fail_json(msg="No artifact found for digest(s): {0}".format(', '.join(missing_artifacts)))
+        content_hrefs.update(module.create_file_contents(
+            dict(((artifact_hrefs[digest], relative_path), (digest, relative_path)) for digest, relative_path in missing)
+        ))
+    else:
+        missing = []
+    module.exit_json(
+        file_content_units=[
+            {
+                'digest': digest,
+                'relative_path': relative_path,
+                'pulp_href': content_hrefs.get((digest, relative_path)),
+                'changed': (digest, relative_path) in missing,
+            }
+            for digest, relative_path in units
+        ],
+    )
+
+
 def main():
     module = PulpEntityAnsibleModule(
         argument_spec=dict(
             digest=dict(),
             relative_path=dict(),
+            units=dict(
+                type='list',
+                elements='dict',
+                options=dict(
+                    digest=dict(required=True),
+                    relative_path=dict(required=True),
+                ),
+            ),
+            create_workers=dict(type='int', default=4),
         ),
         required_if=[
-            ('state', 'present', ['digest', 'relative_path']),
-            ('state', 'absent', ['digest', 'relative_path']),
+            ('state', 'present', ['digest', 'units'], True),
+            ('state', 'absent', ['digest', 'units'], True),
+        ],
+        mutually_exclusive=[
+            ('digest', 'units'),
+            ('relative_path', 'units'),
         ],
         entity_name='file_content',
         entity_plural='file_contents',
     )
 
+    if module.params['units'] is not None:
+        process_units(module, module.params['units'])
+    missing_params = [key for key in ('digest', 'relative_path') if module.params[key] is None]
+    if module.params['state'] and missing_params:
+        module.fail_json(msg="state is {0} but all of the following are missing: {1}".format(module.params['state'], ', '.join(missing_params)))
+
     natural_key = {
         'digest': module.params['digest'],
         'relative_path': module.params['relative_path']
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2019, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+
+DOCUMENTATION = r'''
+---
+module: pulp_file_directory_sync
+short_description: Synchronize a local directory into a file repository of a pulp api server instance
+version_added: "2.8"
+description:
+  - "This module makes a file repository contain the files of a local directory."
+  - "Only files missing on the server are uploaded, and only missing content units are created."
+  - "All changes to the repository are applied at once, resulting in a single new repository version."
+options:
+  src_dir:
+    description:
+      - Local directory, whose files matching I(pattern) should be in the repository.
+      - Subdirectories are searched too. The relative paths of the content units are the paths of the files relative to I(src_dir).
+    type: path
+    required: true
+  pattern:
+    description:
+      - Shell style pattern the paths of files in I(src_dir) must match, relative to I(src_dir).
+      - C(*) matches across directories as well.
+    type: str
+    default: '*'
+  repository:
+    description:
+      - Name of the repository
+    type: str
+    required: true
+  exclusive:
+    description:
+      - Remove all file content units from the repository, that do not correspond to a file in I(src_dir).
+      - If no file in I(src_dir) matches I(pattern), the module fails instead of emptying the repository.
+      - Otherwise, only file content units at the relative path of a file in I(src_dir), but with a different digest, are removed.
+    type: bool
+    default: true
+  publish:
+    description:
+      - Make sure there is a publication of the resulting repository version.
+    type: bool
+    default: false
+  distribution:
+    description:
+      - Name of an existing distribution that should serve the publication of the resulting repository version.
+      - Implies I(publish).
+    type: str
+  hash_workers:
+    description:
+      - Number of files to be hashed in parallel.
+    type: int
+    default: 4
+  upload_workers:
+    description:
+      - Number of files to be uploaded in parallel.
+    type: int
+    default: 1
+  create_workers:
+    description:
+      - Number of file content units whose creation is requested in parallel.
+    type: int
+    default: 4
+  upload_state_dir:
+    description:
+      - Directory to keep track of chunked uploads in.
+      - When specified, an upload that failed midway is not deleted, but continued by the next run for the same file.
+    type: path
+  digest_cache_dir:
+    description:
+      - Directory to cache the sha256 digests of local files in.
+      - When specified, files that did not change since they were last hashed are not read again.
+    type: path
+  digest_cache_size:
+    description:
+      - Maximum number of entries in the digest cache.
+    type: int
+    default: 10000
+extends_documentation_fragment:
+  - pulp
+author:
+  - Matthias Dellweg (@mdellweg)
+'''
+
+EXAMPLES = r'''
+- name: Make a repository match a build directory, and serve it
+  pulp_file_directory_sync:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    src_dir: build/release
+    repository: file_repo_1
+    distribution: file_distribution_1
+    upload_workers: 4
+    digest_cache_dir: ~/.cache/pulp_digests
+  register: sync_result
+- name: Add the documentation to a repository, keeping everything else
+  pulp_file_directory_sync:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    src_dir: build
+    pattern: 'docs/*.html'
+    repository: file_repo_1
+    exclusive: false
+'''
+
+RETURN = r'''
+  repository_version:
+    description: Href of the repository version after the synchronization
+    type: str
+  added_content:
+    description: Hrefs of the file content units added to the repository
+    type: list
+  removed_content:
+    description: Hrefs of the file content units removed from the repository
+    type: list
+  uploaded_artifacts:
+    description: Hrefs of the artifacts uploaded by sha256 digest
+    type: dict
+  publication:
+    description: Href of the publication of the resulting repository version
+    type: str
+    return: when publish or distribution is given
+'''
+
+
+import os
+
+from ansible.module_utils.pulp_helper import (
+    PulpAnsibleModule,
+    find_files,
+)
+
+
+def publish(module, repository_version_href):
+    # Older servers ignore the repository_version filter, so the results are checked here.
+    for publication in module.iterate_entities(module.file_publications_api, repository_version=repository_version_href):
+        if publication.repository_version == repository_version_href:
+            return publication.pulp_href
+    publication = module.create_entity(
+        module.file_publications_api,
+        module.file_publication_class,
+        {'repository_version': repository_version_href},
+        {},
+    )
+    # In check mode, the publication is not actually created.
+    return getattr(publication, 'pulp_href', None)
+
+
+def main():
+    module = PulpAnsibleModule(
+        argument_spec=dict(
+            src_dir=dict(type='path', required=True),
+            pattern=dict(default='*'),
+            repository=dict(required=True),
+            exclusive=dict(type='bool', default=True),
+            publish=dict(type='bool', default=False),
+            distribution=dict(),
+            hash_workers=dict(type='int', default=4),
+            upload_workers=dict(type='int', default=1),
+            create_workers=dict(type='int', default=4),
+            upload_state_dir=dict(type='path'),
+            digest_cache_dir=dict(type='path'),
+            digest_cache_size=dict(type='int', default=10000),
+        ),
+    )
+
+    src_dir = module.params['src_dir']
+    if not os.path.isdir(src_dir):
+        module.fail_json(msg="Directory '{0}' not found.".format(src_dir))
+    repository_name = module.params['repository']
+    repository_href = module.find_entity_href(module.file_repositories_api, {'name': repository_name})
+    if repository_href is None:
+        module.fail_json(msg="Repository '{}' not found.".format(repository_name))
+    distribution = None
+    if module.params['distribution']:
+        distribution = module.find_entity(module.file_distributions_api, {'name': module.params['distribution']})
+        if distribution is None:
+            module.fail_json(msg="Distribution '{}' not found.".format(module.params['distribution']))
+
+    paths = find_files(src_dir, module.params['pattern'])
+    if not paths and module.params['exclusive']:
+        module.fail_json(msg="No files matching '{0}' found in '{1}'.".format(module.params['pattern'], src_dir))
+    digests = module.hash_files(paths)
+    units = dict(
+        ((digest, os.path.relpath(path, src_dir).replace(os.sep, '/')), path)
+        for path, digest in digests.items()
+    )
+
+    repository = module.read_entity(module.file_repositories_api, repository_href)
+    repository_href = repository.pulp_href
+    latest_version_href = repository.latest_version_href
+    repository_content = module.find_repository_content(latest_version_href)
+    repository_units = dict((unit, pulp_href) for pulp_href, unit in repository_content.items())
+
+    # Content units may well exist on the server already, just not in this repository.
+    content_hrefs = dict((unit, repository_units[unit]) for unit in units if unit in repository_units)
+    content_hrefs.update(module.find_file_content_hrefs(unit for unit in units if unit not in content_hrefs))
+    missing_units = [unit for unit in units if unit not in content_hrefs]
+
+    uploaded_artifacts = {}
+    if missing_units:
+        artifact_hrefs = module.find_artifact_hrefs(digest for digest, relative_path in missing_units)
+        uploaded_artifacts = module.upload_artifacts(dict(
+            (digest, units[(digest, relative_path)]) for digest, relative_path in missing_units if digest not in artifact_hrefs
+        ))
+        artifact_hrefs.update(uploaded_artifacts)
+        content_hrefs.update(module.create_file_contents(dict(
+            ((artifact_hrefs[digest], relative_path), (digest, relative_path)) for digest, relative_path in missing_units
+        )))
+
+    present_hrefs = set(href for href in content_hrefs.values() if href)
+    add_content_units = present_hrefs - set(repository_content)
+    if module.params['exclusive']:
+        remove_content_units = set(repository_content) - present_hrefs
+    else:
+        # A file that changed must not leave its old content unit behind at the same path.
+        relative_paths = set(relative_path for digest, relative_path in units)
+        remove_content_units = set(
+            pulp_href for pulp_href, (digest, relative_path) in repository_content.items()
+            if relative_path in relative_paths and pulp_href not in present_hrefs
+        )
+
+    repository_version_href = module.modify_repository(
+        repository_href,
+        add_content_units,
+        remove_content_units,
+        base_version=latest_version_href,
+    ) or latest_version_href
+
+    result = dict(
+        repository_version=repository_version_href,
+        added_content=sorted(add_content_units),
+        removed_content=sorted(remove_content_units),
+        uploaded_artifacts=uploaded_artifacts,
+    )
+    if module.params['publish'] or distribution:
+        if module.check_mode and module._changed:
+            # The repository version to publish does not exist yet.
+            publication_href = None
+        elif repository_version_href:
+            publication_href = publish(module, repository_version_href)
+        else:
+            publication_href = None
+        if distribution and publication_href and distribution.publication != publication_href:
+            module.update_entity(module.file_distributions_api, distribution, {'publication': publication_href})
+        result['publication'] = publication_href
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -50,6 +50,7 @@ options:
       - absent
 extends_documentation_fragment:
   - pulp
+  - pulp.entity
 author:
   - Matthias Dellweg (@mdellweg)
 '''
@@ -95,21 +96,20 @@ RETURN = r'''
 '''
 
 
-from ansible.module_utils.pulp_helper import PulpEntityAnsibleModule
+from ansible.module_utils.pulp_helper import (
+    ENTITY_ATTRIBUTES_SPECS,
+    ENTITY_REQUIRED_IF,
+    PulpEntityAnsibleModule,
+)
 
 
 def main():
     module = PulpEntityAnsibleModule(
         argument_spec=dict(
             name=dict(),
-            base_path=dict(),
-            publication=dict(),
-            content_guard=dict(),
+            **ENTITY_ATTRIBUTES_SPECS['file_distribution']
         ),
-        required_if=[
-            ('state', 'present', ['name', 'base_path']),
-            ('state', 'absent', ['name']),
-        ],
+        required_if=ENTITY_REQUIRED_IF['file_distribution'],
         entity_name='file_distribution',
         entity_plural='file_distributions',
     )
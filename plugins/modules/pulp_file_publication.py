@@ -45,6 +45,7 @@ options:
       - absent
 extends_documentation_fragment:
   - pulp
+  - pulp.entity
 author:
   - Matthias Dellweg (@mdellweg)
 '''
@@ -112,24 +113,23 @@ def main():
     }
 
     if repository_name:
-        repository = module.find_entity(module.file_repositories_api, {'name': repository_name})
-        if repository is None:
+        repository_href = module.find_entity_href(module.file_repositories_api, {'name': repository_name})
+        if repository_href is None:
             module.fail_json(msg="Failed to find repository ({repository_name}).".format(repository_name=repository_name))
+        # Reading the repository makes sure a cached href is still valid. Without the cache, it was retrieved already.
+        repository = module.read_entity(module.file_repositories_api, repository_href)
         # TODO handle version properly
         if version:
-            repository_version_href = repository.versions_href + "{version}/".format(version=version)
+            repository_version_href = repository.pulp_href + "versions/{version}/".format(version=version)
         else:
             repository_version_href = repository.latest_version_href
-        # TODO proper search
-        # entity = module.find_entity(module.file_publications_api, {'repository_version': repository_version_href})
-        # ---8<----8<---8<---
+        # Older servers ignore the repository_version filter and return all publications.
+        # So the results are checked here, and the scan stops at the first match.
         entity = None
-        search_result = module.file_publications_api.list()
-        for item in search_result.results:
+        for item in module.iterate_entities(module.file_publications_api, repository_version=repository_version_href):
             if item.repository_version == repository_version_href:
                 entity = item
                 break
-        # ---8<----8<---8<---
         entity = module.ensure_entity_state(
             entity_api=module.file_publications_api,
             entity_class=module.file_publication_class,
@@ -141,8 +141,7 @@ def main():
             entity = entity.to_dict()
         module.exit_json(file_publication=entity)
     else:
-        entities = module.list_entities(module.file_publications_api)
-        module.exit_json(file_publications=[entity.to_dict() for entity in entities])
+        module.process_entity_list()
 
 
 if __name__ == '__main__':
@@ -58,6 +58,7 @@ options:
       - absent
 extends_documentation_fragment:
   - pulp
+  - pulp.entity
 author:
   - Matthias Dellweg (@mdellweg)
 '''
@@ -102,6 +103,8 @@ RETURN = r'''
 
 
 from ansible.module_utils.pulp_helper import (
+    ENTITY_ATTRIBUTES_SPECS,
+    ENTITY_REQUIRED_IF,
     PulpEntityAnsibleModule,
 )
 
@@ -110,18 +113,9 @@ def main():
     module = PulpEntityAnsibleModule(
         argument_spec=dict(
             name=dict(),
-            url=dict(),
-            download_concurrency=dict(type=int),
-            policy=dict(
-                choices=['immediate', 'on-demand', 'streamed'],
-            ),
-            proxy_url=dict(type=str),
-            tls_validation=dict(type=bool),
+            **ENTITY_ATTRIBUTES_SPECS['file_remote']
         ),
-        required_if=[
-            ('state', 'present', ['name']),
-            ('state', 'absent', ['name']),
-        ],
+        required_if=ENTITY_REQUIRED_IF['file_remote'],
         entity_name='file_remote',
         entity_plural='file_remotes',
     )
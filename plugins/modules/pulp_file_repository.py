@@ -37,6 +37,7 @@ options:
       - absent
 extends_documentation_fragment:
   - pulp
+  - pulp.entity
 author:
   - Matthias Dellweg (@mdellweg)
 '''
@@ -51,6 +52,16 @@ EXAMPLES = r'''
 - name: Report pulp file repositories
   debug:
     var: repo_status
+- name: Read a selection of file repositories
+  pulp_file_repository:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    filters:
+      name__in:
+        - repo_1
+        - repo_2
+  register: repo_status
 - name: Create a file repository
   pulp_file_repository:
     api_url: localhost:24817
@@ -81,6 +92,8 @@ RETURN = r'''
 
 
 from ansible.module_utils.pulp_helper import (
+    ENTITY_ATTRIBUTES_SPECS,
+    ENTITY_REQUIRED_IF,
     PulpEntityAnsibleModule,
 )
 
@@ -89,12 +102,9 @@ def main():
     module = PulpEntityAnsibleModule(
         argument_spec=dict(
             name=dict(),
-            description=dict(),
+            **ENTITY_ATTRIBUTES_SPECS['file_repository']
         ),
-        required_if=[
-            ('state', 'present', ['name']),
-            ('state', 'absent', ['name']),
-        ],
+        required_if=ENTITY_REQUIRED_IF['file_repository'],
         entity_name='file_repository',
         entity_plural='file_repositories',
     )
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2019, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+
+DOCUMENTATION = r'''
+---
+module: pulp_file_repository_content
+short_description: Manage the content of a file repository of a pulp api server instance
+version_added: "2.8"
+description:
+  - "This module adds content units to and removes them from a file repository."
+  - "All changes are applied at once, resulting in a single new repository version."
+options:
+  repository:
+    description:
+      - Name of the repository
+    type: str
+    required: true
+  present_content:
+    description:
+      - File content units that should be in the repository.
+      - Each one is given either by I(pulp_href), or by I(digest) and I(relative_path).
+    type: list
+    elements: dict
+    suboptions:
+      pulp_href:
+        description:
+          - Href of the file content unit
+        type: str
+      digest:
+        description:
+          - sha256 digest of the file content unit
+        type: str
+      relative_path:
+        description:
+          - Relative path of the file content unit
+        type: str
+  absent_content:
+    description:
+      - File content units that should not be in the repository.
+      - Each one is given like in I(present_content).
+    type: list
+    elements: dict
+    suboptions:
+      pulp_href:
+        description:
+          - Href of the file content unit
+        type: str
+      digest:
+        description:
+          - sha256 digest of the file content unit
+        type: str
+      relative_path:
+        description:
+          - Relative path of the file content unit
+        type: str
+  exclusive:
+    description:
+      - Remove all file content units from the repository, that are not listed in I(present_content).
+    type: bool
+    default: false
+extends_documentation_fragment:
+  - pulp
+author:
+  - Matthias Dellweg (@mdellweg)
+'''
+
+EXAMPLES = r'''
+- name: Add file content units to a repository
+  pulp_file_repository_content:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    repository: file_repo_1
+    present_content:
+      - digest: 0000111122223333444455556666777788889999aaaabbbbccccddddeeeeffff
+        relative_path: "data/important_file.txt"
+      - pulp_href: /pulp/api/v3/content/file/files/aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa/
+    absent_content:
+      - digest: ffffeeeeddddccccbbbbaaaa9999888877776666555544443333222211110000
+        relative_path: "data/obsolete_file.txt"
+  register: content_result
+- name: Make the repository contain exactly the given file content units
+  pulp_file_repository_content:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    repository: file_repo_1
+    present_content: "{{ release_content }}"
+    exclusive: true
+'''
+
+RETURN = r'''
+  repository_version:
+    description: Href of the repository version after the modification
+    type: str
+  added_content:
+    description: Hrefs of the file content units added to the repository
+    type: list
+  removed_content:
+    description: Hrefs of the file content units removed from the repository
+    type: list
+'''
+
+
+from ansible.module_utils.pulp_helper import PulpAnsibleModule
+
+
+CONTENT_SPEC = dict(
+    pulp_href=dict(),
+    digest=dict(),
+    relative_path=dict(),
+)
+
+
+def split_content(module, content):
+    """Split a list of content unit options into hrefs and (digest, relative_path) tuples."""
+    hrefs = set()
+    units = set()
+    for item in content or []:
+        if item['pulp_href']:
+            hrefs.add(item['pulp_href'])
+        elif item['digest'] and item['relative_path']:
+            units.add((item['digest'], item['relative_path']))
+        else:
+            module.fail_json(msg="Each content unit needs either pulp_href, or digest and relative_path.")
+    return hrefs, units
+
+
+def main():
+    module = PulpAnsibleModule(
+        argument_spec=dict(
+            repository=dict(required=True),
+            present_content=dict(type='list', elements='dict', options=CONTENT_SPEC),
+            absent_content=dict(type='list', elements='dict', options=CONTENT_SPEC),
+            exclusive=dict(type='bool', default=False),
+        ),
+    )
+
+    repository_name = module.params['repository']
+    repository_href = module.find_entity_href(module.file_repositories_api, {'name': repository_name})
+    if repository_href is None:
+        module.fail_json(msg="Repository '{}' not found.".format(repository_name))
+    repository = module.read_entity(module.file_repositories_api, repository_href)
+    repository_href = repository.pulp_href
+    latest_version_href = repository.latest_version_href
+
+    # The whole content of the latest version is fetched page by page, to compare it as sets.
+    repository_content = module.find_repository_content(latest_version_href)
+    repository_units = dict((unit, pulp_href) for pulp_href, unit in repository_content.items())
+
+    present_hrefs, present_units = split_content(module, module.params['present_content'])
+    absent_hrefs, absent_units = split_content(module, module.params['absent_content'])
+
+    present_hrefs.update(repository_units[unit] for unit in present_units if unit in repository_units)
+    missing_units = set(unit for unit in present_units if unit not in repository_units)
+    if missing_units:
+        content_hrefs = module.find_file_content_hrefs(missing_units)
+        unknown_units = missing_units - set(content_hrefs)
+        if unknown_units:
+            module.fail_json(msg="File content unit(s) not found: {0}".format(
+                ', '.join('{0} ({1})'.format(relative_path, digest) for digest, relative_path in sorted(unknown_units))
+            ))
+        present_hrefs.update(content_hrefs.values())
+    absent_hrefs.update(repository_units[unit] for unit in absent_units if unit in repository_units)
+
+    conflicting_hrefs = present_hrefs & absent_hrefs
+    if conflicting_hrefs:
+        module.fail_json(msg="File content unit(s) requested to be both present and absent: {0}".format(', '.join(sorted(conflicting_hrefs))))
+
+    add_content_units = present_hrefs - set(repository_content)
+    if module.params['exclusive']:
+        remove_content_units = set(repository_content) - present_hrefs
+    else:
+        remove_content_units = absent_hrefs & set(repository_content)
+
+    repository_version = module.modify_repository(
+        repository_href,
+        add_content_units,
+        remove_content_units,
+        base_version=latest_version_href,
+    ) or latest_version_href
+
+    module.exit_json(
+        repository_version=repository_version,
+        added_content=sorted(add_content_units),
+        removed_content=sorted(remove_content_units),
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -20,17 +20,61 @@ short_description: Synchronize a file remote on a pulp api server instance
 version_added: "2.8"
 description:
   - "This module synchronizes a file remote into a repository."
+  - "Given a list of I(syncs), it synchronizes many remotes into their repositories, several of them at a time."
 options:
   remote:
     description:
       - Name of the remote to synchronize
+      - Required together with I(repository), unless I(syncs) is given.
     type: str
-    required: true
   repository:
     description:
       - Name of the repository
+      - Required together with I(remote), unless I(syncs) is given.
     type: str
-    required: true
+  syncs:
+    description:
+      - List of remotes to synchronize into repositories.
+      - All names are looked up at once, and the syncs are tracked together, so this is a lot faster than looping over the module.
+    type: list
+    elements: dict
+    suboptions:
+      remote:
+        description:
+          - Name of the remote to synchronize
+        type: str
+        required: true
+      repository:
+        description:
+          - Name of the repository
+        type: str
+        required: true
+  sync_limit:
+    description:
+      - Maximum number of I(syncs) running on the server at a time.
+      - Keeps the workers of the server from being swamped, so other tasks are not held up for long.
+      - With I(wait) false, all syncs are started right away.
+    type: int
+    default: 4
+  sync_cache_dir:
+    description:
+      - Directory to keep a record of the last successful sync of each repository in.
+      - When specified, the manifest of a remote is fetched before syncing it. The sync is skipped,
+        if the manifest did not change since the last sync, and neither the remote nor the repository was changed since.
+      - The manifest is fetched with the ETag of the last fetch, so an unchanged one is usually not even transferred.
+      - Remotes with a C(proxy_url), C(ca_cert) or C(client_cert) are always synced, as the manifest is only fetched directly.
+    type: path
+  sync_interval:
+    description:
+      - Number of seconds after a successful sync, during which syncing the same remote into the same repository is skipped,
+        without even fetching the manifest.
+      - Requires I(sync_cache_dir).
+    type: int
+  check_workers:
+    description:
+      - Number of manifests of I(syncs) to be fetched in parallel.
+    type: int
+    default: 4
 extends_documentation_fragment:
   - pulp
 author:
@@ -49,44 +93,305 @@ EXAMPLES = r'''
 - name: Report pulp repositories
   debug:
     var: sync_status.repository_version
+- name: Sync many repositories, remembering the hrefs of remotes and repositories between runs
+  pulp_file_sync:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    repository: "{{ item }}"
+    remote: "{{ item }}"
+    lookup_cache_dir: ~/.cache/pulp_lookups
+  loop: "{{ mirrored_repositories }}"
+- name: Sync several repositories in one go, two at a time
+  pulp_file_sync:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    syncs:
+      - remote: upstream_docs
+        repository: docs
+      - remote: upstream_isos
+        repository: isos
+      - remote: upstream_isos_testing
+        repository: isos_testing
+    sync_limit: 2
+  register: sync_results
+- name: Mirror repositories every 15 minutes, only syncing what changed upstream
+  pulp_file_sync:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    syncs: "{{ mirrored_syncs }}"
+    sync_cache_dir: ~/.cache/pulp_syncs
+- name: Start syncing many repositories, without waiting for each one
+  pulp_file_sync:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    repository: "{{ item }}"
+    remote: "{{ item }}"
+    wait: false
+  loop: "{{ mirrored_repositories }}"
+  register: sync_starts
+- name: Wait for all of the syncs
+  pulp_task:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    tasks: "{{ sync_starts.results | map(attribute='task_hrefs') | flatten }}"
 '''
 
 RETURN = r'''
   repository_version:
     description: Repository version after synching
     type: dict
+    return: when remote and repository are given, and wait is true
+  skipped:
+    description: Whether the sync was skipped, because the manifest of the remote did not change since the last sync
+    type: bool
+    return: when the sync was skipped
+  syncs:
+    description:
+      - Outcome of each sync, in the order of I(syncs). The state of skipped syncs is C(skipped).
+      - A sync that exceeded I(task_timeout) has C(timed_out) set, and is in the state it was left in, or C(canceled).
+        The other syncs go on regardless, and the module fails in the end.
+    type: list
+    return: when syncs is given, and wait is true
+    sample:
+      - remote: file_remote_1
+        repository: file_repo_1
+        repository_version: /pulp/api/v3/repositories/file/file/aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa/versions/2/
+        changed: true
+        task: /pulp/api/v3/tasks/aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa/
+        state: completed
+        duration: 12.345
+        wait_time: 14.8
+        timed_out: false
+  task_hrefs:
+    description: Hrefs of the sync tasks
+    type: list
+    return: when wait is false
 '''
 
 
-from ansible.module_utils.pulp_helper import PulpAnsibleModule
+from time import time
+
+from ansible.module_utils.pulp_helper import (
+    PulpAnsibleModule,
+    fetch_manifest_fingerprint,
+    parse_timestamp,
+    task_duration,
+    threaded_imap,
+)
+
+
+def remote_updated(remote):
+    # Both transports share the cache, but only the generated clients parse timestamps.
+    timestamp = parse_timestamp(getattr(remote, 'pulp_last_updated', None))
+    return timestamp.replace(tzinfo=None).isoformat() if timestamp else None
+
+
+def check_sync(module, repository, remote):
+    """Decide whether syncing remote into repository may change anything.
+
+    Returns None if the sync can be skipped, or else the fingerprint of the manifest to record once the sync succeeded.
+    """
+    last_sync = module.sync_cache.get(repository.pulp_href, remote.pulp_href)
+    if last_sync:
+        synced_state = (last_sync['url'], last_sync['remote_updated'], last_sync['repository_version'])
+        if synced_state != (remote.url, remote_updated(remote), repository.latest_version_href):
+            # The remote was changed, or the repository was changed by other means since.
+            last_sync = None
+    if last_sync and module.params['sync_interval'] and time() - last_sync['synced_at'] < module.params['sync_interval']:
+        return None
+    if any(getattr(remote, key, None) for key in ('proxy_url', 'ca_cert', 'client_cert')):
+        # The manifest would have to be fetched through the proxy, or with the certificates, of the remote.
+        # Only the sync task does that.
+        return {'etag': None, 'sha256': None}
+    try:
+        etag, sha256 = fetch_manifest_fingerprint(
+            remote.url,
+            etag=last_sync and last_sync['etag'],
+            validate_certs=getattr(remote, 'tls_validation', True) is not False,
+        )
+    except Exception:
+        # Let the sync task report what is wrong with the remote.
+        return {'etag': None, 'sha256': None}
+    if last_sync and sha256 in (None, last_sync['sha256']):
+        if etag != last_sync['etag']:
+            module.sync_cache.set(
+                repository.pulp_href, remote.pulp_href, remote.url, last_sync['remote_updated'], etag, last_sync['sha256'],
+                last_sync['repository_version'], synced_at=last_sync['synced_at'],
+            )
+        return None
+    return {'etag': etag, 'sha256': sha256}
+
+
+def record_sync(module, repository, remote, fingerprint, repository_version):
+    if fingerprint is not None:
+        module.sync_cache.set(
+            repository.pulp_href, remote.pulp_href, remote.url, remote_updated(remote), fingerprint['etag'], fingerprint['sha256'],
+            repository_version,
+        )
+
+
+def sync_many(module):
+    syncs = module.params['syncs']
+    remotes = module.find_entities_by_name(module.file_remotes_api, (sync['remote'] for sync in syncs))
+    repositories = module.find_entities_by_name(module.file_repositories_api, (sync['repository'] for sync in syncs))
+    missing_remotes = sorted(set(sync['remote'] for sync in syncs if sync['remote'] not in remotes))
+    if missing_remotes:
+        module.fail_json(msg="Remotes not found: {0}".format(', '.join(missing_remotes)))
+    missing_repositories = sorted(set(sync['repository'] for sync in syncs if sync['repository'] not in repositories))
+    if missing_repositories:
+        module.fail_json(msg="Repositories not found: {0}".format(', '.join(missing_repositories)))
+
+    def start_sync(index):
+        sync = syncs[index]
+        response = module.file_repositories_api.sync(
+            repositories[sync['repository']].pulp_href,
+            {'remote': remotes[sync['remote']].pulp_href},
+        )
+        return response.task
+
+    results = [None] * len(syncs)
+    fingerprints = [None] * len(syncs)
+    if module.sync_cache:
+        fingerprints = list(threaded_imap(
+            lambda sync: check_sync(module, repositories[sync['repository']], remotes[sync['remote']]),
+            syncs,
+            module.params['check_workers'],
+        ))
+        for index, sync in enumerate(syncs):
+            if fingerprints[index] is None:
+                results[index] = {
+                    'remote': sync['remote'],
+                    'repository': sync['repository'],
+                    'repository_version': repositories[sync['repository']].latest_version_href,
+                    'changed': False,
+                    'task': None,
+                    'state': 'skipped',
+                    'duration': None,
+                    'wait_time': None,
+                    'timed_out': False,
+                }
+    pending = [index for index in range(len(syncs)) if results[index] is None]
+
+    if not module.params['wait']:
+        for index in pending:
+            module.handle_task(start_sync(index))
+        module._changed = bool(pending)
+        module.exit_json()
+
+    for index, task, wait_time, timed_out in module.dispatch_tasks(start_sync, pending, module.params['sync_limit']):
+        sync = syncs[index]
+        changed = False
+        repository_version = None
+        if task.state == 'completed':
+            if task.created_resources:
+                changed = module._changed = True
+                repository_version = task.created_resources[0]
+            else:
+                repository_version = repositories[sync['repository']].latest_version_href
+            record_sync(module, repositories[sync['repository']], remotes[sync['remote']], fingerprints[index], repository_version)
+        results[index] = {
+            'remote': sync['remote'],
+            'repository': sync['repository'],
+            'repository_version': repository_version,
+            'changed': changed,
+            'task': task.pulp_href,
+            'state': task.state,
+            'duration': task_duration(task),
+            'wait_time': round(wait_time, 3),
+            'timed_out': timed_out,
+        }
+
+    failed = [result for result in results if result['state'] not in ('completed', 'skipped')]
+    if failed:
+        module.fail_json(
+            msg='{0} of {1} syncs failed to complete. ({2})'.format(
+                len(failed),
+                len(results),
+                ', '.join(result['repository'] for result in failed),
+            ),
+            syncs=results,
+        )
+    module.exit_json(syncs=results)
 
 
 def main():
     module = PulpAnsibleModule(
         argument_spec=dict(
-            remote=dict(required=True),
-            repository=dict(required=True),
+            remote=dict(),
+            repository=dict(),
+            syncs=dict(
+                type='list',
+                elements='dict',
+                options=dict(
+                    remote=dict(required=True),
+                    repository=dict(required=True),
+                ),
+            ),
+            sync_limit=dict(type='int', default=4),
+            sync_cache_dir=dict(type='path'),
+            sync_interval=dict(type='int'),
+            check_workers=dict(type='int', default=4),
         ),
+        required_one_of=[
+            ('repository', 'syncs'),
+        ],
+        required_together=[
+            ('remote', 'repository'),
+        ],
+        mutually_exclusive=[
+            ('remote', 'syncs'),
+            ('repository', 'syncs'),
+        ],
     )
 
+    if module.params['sync_interval'] and not module.params['sync_cache_dir']:
+        module.fail_json(msg="sync_interval requires sync_cache_dir.")
+    if module.params['syncs'] is not None:
+        if module.params['sync_limit'] < 1:
+            module.fail_json(msg="sync_limit must be at least 1.")
+        sync_many(module)
+
     remote_name = module.params['remote']
     repository_name = module.params['repository']
 
-    remote = module.find_entity(module.file_remotes_api, {'name': remote_name})
-    if remote is None:
+    remote_href = module.find_entity_href(module.file_remotes_api, {'name': remote_name})
+    if remote_href is None:
         module.fail_json(msg="Remote '{}' not found.".format(remote_name))
 
-    repository = module.find_entity(module.file_repositories_api, {'name': repository_name})
-    if repository is None:
+    repository_href = module.find_entity_href(module.file_repositories_api, {'name': repository_name})
+    if repository_href is None:
         module.fail_json(msg="Repository '{}' not found.".format(repository_name))
 
-    repository_version = repository.latest_version_href
-    result = module.file_repositories_api.sync(repository.pulp_href, {'remote': remote.pulp_href})
-    sync_task = module.wait_for_task(result.task)
+    fingerprint = None
+    if module.sync_cache:
+        repository = module.read_entity(module.file_repositories_api, repository_href)
+        remote = module.read_entity(module.file_remotes_api, remote_href)
+        repository_href, remote_href = repository.pulp_href, remote.pulp_href
+        fingerprint = check_sync(module, repository, remote)
+        if fingerprint is None:
+            module.exit_json(repository_version=repository.latest_version_href, skipped=True)
+
+    def start_sync(repository_href, remote_href):
+        return repository_href, module.file_repositories_api.sync(repository_href, {'remote': remote_href})
 
+    repository_href, result = module.call_with_cached_hrefs(start_sync, repository_href, remote_href)
+    sync_task = module.handle_task(result.task)
+
+    if sync_task is None:
+        module._changed = True
+        module.exit_json()
     if sync_task.created_resources:
         module._changed = True
         repository_version = sync_task.created_resources[0]
+    else:
+        repository_version = module.read_entity(module.file_repositories_api, repository_href).latest_version_href
+    if fingerprint is not None:
+        record_sync(module, repository, remote, fingerprint, repository_version)
 
     module.exit_json(repository_version=repository_version)
 
@@ -37,6 +37,12 @@ EXAMPLES = r'''
 - name: Report pulp status
   debug:
     var: pulp_status
+- name: Check the server quickly, without loading the generated api clients
+  pulp_status:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    transport: rest
 '''
 
 RETURN = r'''
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2019, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+
+DOCUMENTATION = r'''
+---
+module: pulp_task
+short_description: Wait for tasks on a pulp api server instance
+version_added: "2.8"
+description:
+  - "This module waits for a number of tasks on a pulp api server instance to finish, and reports their outcome."
+  - "Tasks are usually started by other modules with I(wait=false)."
+  - "All tasks are polled together, so waiting for many of them takes few requests."
+  - "The module fails, if any of the tasks failed or was canceled."
+options:
+  tasks:
+    description:
+      - Hrefs of the tasks
+    type: list
+    elements: str
+    required: true
+extends_documentation_fragment:
+  - pulp
+author:
+  - Matthias Dellweg (@mdellweg)
+'''
+
+EXAMPLES = r'''
+- name: Start publishing many repository versions
+  pulp_file_publication:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    repository: "{{ item }}"
+    state: present
+    wait: false
+  loop: "{{ mirrored_repositories }}"
+  register: publication_starts
+- name: Wait for all of the publications
+  pulp_task:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    tasks: "{{ publication_starts.results | map(attribute='task_hrefs') | flatten }}"
+  register: publication_tasks
+- name: Report the state of the tasks, without waiting
+  pulp_task:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    tasks: "{{ publication_tasks.tasks | map(attribute='pulp_href') | list }}"
+    wait: false
+'''
+
+RETURN = r'''
+  tasks:
+    description: Details of each task, in the order of I(tasks), with the number of seconds it ran on the server as C(duration)
+    type: list
+    sample:
+      - pulp_href: /pulp/api/v3/tasks/aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa/
+        state: completed
+        duration: 1.234
+        created_resources:
+          - /pulp/api/v3/publications/file/file/aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa/
+'''
+
+
+from ansible.module_utils.pulp_helper import (
+    PulpAnsibleModule,
+    task_duration,
+    threaded_imap,
+)
+
+
+def main():
+    module = PulpAnsibleModule(
+        argument_spec=dict(
+            tasks=dict(type='list', elements='str', required=True),
+        ),
+    )
+
+    task_hrefs = module.params['tasks']
+    if module.params['wait']:
+        tasks = dict((task.pulp_href, task) for task in module.wait_for_tasks(task_hrefs))
+    else:
+        tasks = dict(zip(task_hrefs, threaded_imap(module.tasks_api.read, task_hrefs, module.params['list_workers'])))
+
+    results = []
+    for task_href in task_hrefs:
+        task = tasks[task_href]
+        result = task.to_dict()
+        result['duration'] = task_duration(task)
+        results.append(result)
+
+    failed = [result for result in results if result['state'] in ('failed', 'canceled')]
+    if failed:
+        module.fail_json(
+            msg='{0} of {1} tasks failed to complete. ({2})'.format(
+                len(failed),
+                len(results),
+                ', '.join(result['pulp_href'] for result in failed),
+            ),
+            tasks=results,
+        )
+    module.exit_json(tasks=results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""Measure the startup time of the modules.
+
+Every sample is taken in a fresh interpreter, like a module run would be.
+First, the time to import each module is measured, along with the api client packages that loads.
+Then the openapi and the rest transport of pulp_helper are compared.
+That covers loading pulp_helper and the api clients, and with --pulp-url, a first request for the server status.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MODULES = os.path.join(ROOT, 'plugins', 'modules')
+MODULE_UTILS = os.path.join(ROOT, 'plugins', 'module_utils')
+CLIENT_PACKAGES = ['pulpcore.client.pulpcore', 'pulpcore.client.pulp_file']
+
+IMPORT_SAMPLE = r'''
+import json, runpy, sys
+from time import time
+import ansible.module_utils
+ansible.module_utils.__path__.append({module_utils!r})
+start = time()
+runpy.run_path({module_file!r}, run_name='benchmark')
+duration = time() - start
+print(json.dumps([duration, [name for name in {client_packages!r} if name in sys.modules]]))
+'''
+
+TRANSPORT_SAMPLE = r'''
+import json, sys
+from time import time
+start = time()
+sys.path.insert(0, {module_utils!r})
+import pulp_helper
+transport, pulp_url, username, password = {args!r}
+if transport == 'rest':
+    client = pulp_helper.PulpRestClient(pulp_url or 'http://localhost', username, password)
+    if pulp_url:
+        client.read('status/')
+else:
+    pulp_helper.import_pulpcore_client()
+    pulp_helper.import_pulp_file_client()
+    config = pulp_helper.pulpcore.Configuration()
+    config.host = pulp_url or 'http://localhost'
+    config.username = username
+    config.password = password
+    status_api = pulp_helper.pulpcore.StatusApi(pulp_helper.PulpcoreApiClient(config))
+    pulp_helper.pulp_file.RepositoriesFileApi(pulp_helper.PulpFileApiClient(config))
+    if pulp_url:
+        status_api.status_read()
+print(json.dumps(time() - start))
+'''
+
+
+def module_names():
+    return sorted(name[:-3] for name in os.listdir(MODULES) if name.endswith('.py') and not name.startswith('_'))
+
+
+def sample_import(module_name):
+    """Return the time to import a module, and the api client packages loaded by that."""
+    code = IMPORT_SAMPLE.format(
+        module_utils=MODULE_UTILS,
+        module_file=os.path.join(MODULES, module_name + '.py'),
+        client_packages=CLIENT_PACKAGES,
+    )
+    return json.loads(subprocess.check_output([sys.executable, '-c', code]))
+
+
+def sample_transport(transport, options):
+    code = TRANSPORT_SAMPLE.format(module_utils=MODULE_UTILS, args=(transport, options.pulp_url, options.username, options.password))
+    return json.loads(subprocess.check_output([sys.executable, '-c', code]))
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    return '{0:32} median {1:7.1f} ms  min {2:7.1f} ms  max {3:7.1f} ms'.format(
+        name,
+        samples[len(samples) // 2] * 1000,
+        samples[0] * 1000,
+        samples[-1] * 1000,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--pulp-url')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='password')
+    options = parser.parse_args()
+
+    print('Import time by module:')
+    for module_name in module_names():
+        samples = [sample_import(module_name) for _ in range(options.runs)]
+        client_packages = samples[-1][1]
+        print(report(module_name, [duration for duration, packages in samples]) + (
+            '  loads ' + ', '.join(client_packages) if client_packages else ''
+        ))
+
+    print('Startup time by transport:')
+    for transport in ['openapi', 'rest']:
+        print(report(transport, [sample_transport(transport, options) for _ in range(options.runs)]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+import pytest
+
+from benchmark_startup import module_names, sample_import
+
+
+@pytest.mark.parametrize('module_name', module_names())
+def test_import_loads_no_api_client(module_name):
+    # The generated api clients are slow to load, so only running a module may import them.
+    duration, client_packages = sample_import(module_name)
+    assert client_packages == []
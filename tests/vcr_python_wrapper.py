@@ -21,7 +21,7 @@ def amp_body_matcher(r1, r2):
         if 'search' in body2:
             body2['search'] = ','.join(sorted(re.findall(r'([^=,]*="(?:[^"]|\\")*")', body2['search'])))
         return body1 == body2
-    elif r1.headers.get('content-type').startswith('multipart/form-data') and r2.headers.get('content-type').startswith('multipart/form-data'):
+    elif (r1.headers.get('content-type') or '').startswith('multipart/form-data') and (r2.headers.get('content-type') or '').startswith('multipart/form-data'):
         if r1.body is None or r2.body is None:
             return r1.body == r2.body
         boundary1 = re.findall(r'boundary=(\S.*)', r1.headers['content-type'])[0].encode()